@@ -0,0 +1,197 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import json
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, request
+from wtforms.validators import ValidationError
+
+from models import db
+import importer
+import queries
+import scheduler
+
+
+#----------------------------------------------------------------------------#
+# JSON API, version 1.
+#
+# Mirrors the HTML pages through the same queries module. Every endpoint
+# accepts `fields=a,b,c` to select only those columns from the database
+# and answers with an ETag, so clients can revalidate with If-None-Match.
+#----------------------------------------------------------------------------#
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError('%r is not JSON serializable' % value)
+
+
+def _json(data, status=200):
+    response = Response(json.dumps(data, default=_default),
+                        status=status, mimetype='application/json')
+    if status == 200:
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def _error(status, message):
+    return _json({"error": message}, status)
+
+
+def _requested_fields():
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+
+def _genre_args():
+    # ?genre=Jazz&genre=Blues, every genre required unless match=any
+    return dict(genres=request.args.getlist('genre'),
+                match=request.args.get('match', 'all'))
+
+
+def _genre_counts(name, tag, counts):
+    # one unnest/GROUP BY per filter set, until a write bumps the tag
+    return current_app.extensions['response_cache'].memoize(
+        name, [tag], counts, **_genre_args())
+
+
+def _page_args():
+    return dict(after=request.args.get('after'),
+                before=request.args.get('before'),
+                limit=request.args.get('limit', type=int),
+                fields=_requested_fields())
+
+
+def _page(page):
+    return {"data": page["items"], "limit": page["limit"],
+            "next": page["next"], "prev": page["prev"]}
+
+
+@api.errorhandler(queries.FieldError)
+def unknown_field(error):
+    return _error(400, str(error))
+
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@api.route('/venues')
+def venues():
+    # the bounded area index, as /areas; each area's venues are paged
+    # through /areas/<id>/venues
+    return _json({"areas": queries.area_index(**_genre_args())})
+
+
+@api.route('/venues/genres')
+def venue_genres():
+    return _json({"genres": _genre_counts('venue_genres', 'venues', queries.venue_genre_counts)})
+
+
+@api.route('/venues/search')
+def search_venues():
+    return _json(queries.search_venues(request.args.get('search_term', ''),
+                                       fields=_requested_fields(), **_genre_args()))
+
+
+@api.route('/venues/<int:venue_id>')
+def show_venue(venue_id):
+    data = queries.venue_detail(venue_id, fields=_requested_fields())
+    if data is None:
+        return _error(404, 'venue %d not found' % venue_id)
+    return _json(data)
+
+
+#  Areas
+#  ----------------------------------------------------------------
+
+@api.route('/areas')
+def areas():
+    return _json({"areas": queries.area_index(**_genre_args())})
+
+
+@api.route('/areas/<int:area_id>/venues')
+def area_venues(area_id):
+    page = queries.area_venues(area_id, **_page_args(), **_genre_args())
+    if page is None:
+        return _error(404, 'area %d not found' % area_id)
+    data = _page(page)
+    data["area"] = page["area"]
+    return _json(data)
+
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@api.route('/artists')
+def artists():
+    return _json(_page(queries.artists_page(**_page_args(), **_genre_args())))
+
+
+@api.route('/artists/genres')
+def artist_genres():
+    return _json({"genres": _genre_counts('artist_genres', 'artists', queries.artist_genre_counts)})
+
+
+@api.route('/artists/search')
+def search_artists():
+    return _json(queries.search_artists(request.args.get('search_term', ''),
+                                        fields=_requested_fields(), **_genre_args()))
+
+
+@api.route('/artists/<int:artist_id>')
+def show_artist(artist_id):
+    data = queries.artist_detail(artist_id, fields=_requested_fields())
+    if data is None:
+        return _error(404, 'artist %d not found' % artist_id)
+    return _json(data)
+
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@api.route('/shows')
+def shows():
+    return _json(_page(queries.shows_page(**_page_args())))
+
+
+@api.route('/shows/schedule', methods=['POST'])
+def schedule_shows():
+    # {"shows": [{"venue_id", "artist_id", "start_time"}, ...], "strict": false}
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get('shows'), list):
+        return _error(400, 'expected a JSON object with a "shows" list')
+    strict = bool(payload.get('strict'))
+
+    rows, rejected = [], []
+    for index, row in enumerate(payload['shows']):
+        try:
+            if not isinstance(row, dict):
+                raise ValidationError('a show must be a JSON object')
+            rows.append((index, importer.clean_show(row)))
+        except ValidationError as error:
+            rejected.append((index, str(error)))
+
+    scheduled = []
+    if not (strict and rejected):
+        scheduled, conflicts = scheduler.schedule_shows(
+            rows, scheduler.show_duration(), strict=strict)
+        rejected += conflicts
+    db.session.commit()
+
+    if scheduled:
+        current_app.extensions['response_cache'].invalidate(
+            'shows', 'venues',
+            *['venue:%d' % venue_id for venue_id in {row['venue_id'] for row in scheduled}],
+            *['artist:%d' % artist_id for artist_id in {row['artist_id'] for row in scheduled}])
+
+    return _json({"scheduled": len(scheduled),
+                  "rejected": [{"index": index, "error": error}
+                               for index, error in sorted(rejected)]},
+                 409 if strict and rejected else 200)
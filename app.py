@@ -5,15 +5,15 @@
 from email.headerregistry import Address
 from email.policy import default
 import json
-import dateutil.parser
-import babel
 from flask import (Flask,
                    render_template,
                    request,
                    Response,
                    flash,
                    redirect,
-                   url_for)
+                   url_for,
+                   abort,
+                   stream_with_context)
 from flask_moment import Moment
 
 import logging
@@ -22,6 +22,17 @@ from flask_wtf import Form
 from forms import *
 import sys
 from models import app, db, Venue, Artist, Show
+import queries
+import scheduler
+import exporter
+from api import api
+from cache import ResponseCache, conditional
+from formatting import DateTimeFormatter
+import metrics
+from metrics import instrument_app, instrument_pool
+from profiling import QueryProfiler
+from routing import ReplicaRouter
+from templating import init_templates
 
 
 #----------------------------------------------------------------------------#
@@ -31,6 +42,12 @@ from models import app, db, Venue, Artist, Show
 moment = Moment(app)
 app.config.from_object('config')
 db.init_app(app)
+instrument_pool(app)
+replica_router = ReplicaRouter(app)
+instrument_app(app)
+query_profiler = QueryProfiler(app)
+response_cache = ResponseCache(app)
+app.register_blueprint(api)
 
 
 #----------------------------------------------------------------------------#
@@ -38,28 +55,50 @@ db.init_app(app)
 #----------------------------------------------------------------------------#
 
 
-def format_datetime(value, format='medium'):
-    # allow even datetime objects to be passed
-    if isinstance(value, str):
-        date = dateutil.parser.parse(value)
-    else:
-        date = value
-    # date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format, locale='en')
-
+# compiled once, memoizes the formatted strings of repeated show times
+format_datetime = DateTimeFormatter(locale='en')
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+# last, the templates compile against the filters and extensions above
+init_templates(app)
+
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#----------------------------------------------------------------------------#
+
+
+def invalidate_venue(venue_id, artist_ids):
+    # the venue page, the listings showing its name and the pages of
+    # artists that played there
+    response_cache.invalidate('venues', 'shows', 'venue:%s' % venue_id,
+                              *['artist:%s' % artist_id for artist_id in artist_ids])
+
+
+def invalidate_artist(artist_id, venue_ids):
+    # the artist page, the listings showing its name and the pages of
+    # venues it played at
+    response_cache.invalidate('artists', 'shows', 'artist:%s' % artist_id,
+                              *['venue:%s' % venue_id for venue_id in venue_ids])
+
+#----------------------------------------------------------------------------#
+# Genre filters.
+#----------------------------------------------------------------------------#
+
+
+def genre_args():
+    # ?genre=Jazz&genre=Blues keeps rows having every genre, add match=any
+    # for rows having one of them; search forms post the same fields
+    return dict(genres=request.values.getlist('genre'),
+                match=request.values.get('match', 'all'))
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
 
 
 @app.route('/')
+@response_cache.cached()
 def index():
     return render_template('pages/home.html')
 
@@ -68,121 +107,57 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@response_cache.cached('venues')
 def venues():
 
-    # num_upcoming_shows should be aggregated based on number of upcoming shows per venue.
-    data = []
-    venue_locations = db.session.query(
-        Venue.city, Venue.state).group_by(Venue.city, Venue.state).all()
-    for venue_location in venue_locations:
-        venue_state_city = {"city": venue_location.city,
-                            "state": venue_location.state}
-        # query for venue extra details
-        venue_state_city['venues'] = []
-        venues_in_state_city = db.session.query(Venue.id, Venue.name).\
-            filter(Venue.state == venue_location.state,
-                   Venue.city == venue_location.city).all()
-        for venue in venues_in_state_city:
-            # get number of upcoming shows
-            num_upcoming_shows = Show.query.filter(Show.venue_id == venue.id).filter(
-                Show.start_time >= datetime.today().date()).count()
-            # append the venue details to the venue_details dict
-            venue_details = {'id': venue.id, "name": venue.name,
-                             "num_upcoming_shows": num_upcoming_shows}
-
-            venue_state_city['venues'].append(venue_details)
-        # append the combined state city with venues to the data list
-        data.append(venue_state_city)
-
-    return render_template('pages/venues.html', areas=data)
+    # the index of city/state areas with their venue counts, and the
+    # genres to narrow them by; each area's venues are paged on its own page
+    genres = genre_args()
+    data = queries.area_index(**genres)
+    facets = response_cache.memoize('venue_genres', ['venues'],
+                                    queries.venue_genre_counts, **genres)
 
+    return render_template('pages/venues.html', areas=data, facets=facets, **genres)
 
-@app.route('/venues/search', methods=['POST'])
-def search_venues():
-
-    # seach for Hop should return "The Musical Hop".
-    # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-
-    response = {}
 
-    search_term = request.form['search_term']
+@app.route('/venues/areas/<int:area_id>')
+@response_cache.cached('venues')
+def show_area(area_id):
 
-    # to enable search all names that have the search_term
-    search_term = '%'+search_term+'%'
+    # one page of the area's venues ordered by name
+    genres = genre_args()
+    page = queries.area_venues(area_id,
+                               after=request.args.get('after'),
+                               before=request.args.get('before'),
+                               limit=request.args.get('limit', type=int),
+                               **genres)
+    if page is None:
+        abort(404)
 
-    # search query
-    venues = db.session.query(Venue.id, Venue.name).filter(
-        Venue.name.ilike(search_term))
+    return render_template('pages/area.html', area=page['area'], venues=page['items'],
+                           page=page, **genres)
 
-    # No of venues
-    venues_count = venues.count()
 
-    response = {"count": venues_count}
-
-    response["data"] = []
-    # append venues in response
-    for venue in venues.all():
-        # aggregate number of supcoming shows per venue
-        num_upcoming_shows = Show.query.filter(Show.venue_id == venue.id).\
-            filter(Show.start_time >= datetime.today().date()).count()
-
-        venue_details = {'id': venue.id, "name": venue.name,
-                         "num_upcoming_shows": num_upcoming_shows}
+@app.route('/venues/search', methods=['POST'])
+def search_venues():
 
-        response["data"].append(venue_details)
+    # search for matching venues with their upcoming show counts
+    # in a single aggregate query
+    response = queries.search_venues(request.form['search_term'], **genre_args())
 
     return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
 
 
 @app.route('/venues/<int:venue_id>')
+@conditional(queries.venue_version)
+@response_cache.cached('venue:{venue_id}')
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
 
-    venue = Venue.query.get(venue_id)
-
-    # Venue details
-    data = {
-        "id": venue.id,
-        "name": venue.name,
-        "genres": venue.genres,
-        "address": venue.address,
-        "city": venue.city,
-        "state": venue.state,
-        "phone": venue.phone,
-        "website": venue.website_link,
-        "facebook_link": venue.facebook_link,
-        "seeking_talent": venue.seeking_talent,
-        "image_link": venue.image_link
-    }
-    # Past Shows
-    data["past_shows"] = []
-    # past shows query
-    past_shows = db.session.query(Show).join(Venue).filter(Show.venue_id == venue.id).\
-        filter(Show.start_time < datetime.today().date())
-
-    for past_show in past_shows.all():
-        past_show_details = {"artist_id": past_show.Artist.id,
-                             "artist_name": past_show.Artist.name,
-                             "artist_image_link": past_show.Artist.image_link,
-                             "start_time": past_show.start_time}
-        data["past_shows"].append(past_show_details)
-
-    data["past_shows_count"] = past_shows.count()
-
-    # Upcoming Shows
-
-    data["upcoming_shows"] = []
-    upcoming_shows = db.session.query(Show).join(Venue).filter(Show.venue_id == venue.id).\
-        filter(Show.start_time >= datetime.today().date())
-
-    for upcoming_show in upcoming_shows.all():
-        upcoming_shows_details = {"artist_id": upcoming_show.Artist.id,
-                                  "artist_name": upcoming_show.Artist.name,
-                                  "artist_image_link": upcoming_show.Artist.image_link,
-                                  "start_time": upcoming_show.start_time}
-        data["upcoming_shows"].append(upcoming_shows_details)
-
-    data["upcoming_shows_count"] = upcoming_shows.count()
+    # venue with all its shows, loaded eagerly
+    data = queries.venue_detail(venue_id)
+    if data is None:
+        abort(404)
 
     return render_template('pages/show_venue.html', venue=data)
 
@@ -219,7 +194,9 @@ def create_venue_submission():
 
             # on successful db insert, flash success
             db.session.add(venue)
+            queries.count_area_venues({(venue.city, venue.state): 1})
             db.session.commit()
+            response_cache.invalidate('venues')
             flash('Venue  was successfully listed!')
 
         except:
@@ -242,10 +219,19 @@ def delete_venue(venue_id):
 
     try:
 
+        # artists whose pages list shows at this venue, before they cascade
+        artist_ids = queries.venue_artist_ids(venue_id)
+        areas = db.session.query(Venue.city, Venue.state).filter_by(id=venue_id).all()
+
         # Get the Venue to delete and delete
-        Venue.query.filter_by(id=venue_id).delete()
+        deleted = Venue.query.filter_by(id=venue_id).delete()
+        # the shows cascade in the database, so recount their artists
+        queries.refresh_upcoming_counts(artist_ids=artist_ids)
+        if deleted:
+            queries.count_area_venues({area: -1 for area in areas})
 
         db.session.commit()
+        invalidate_venue(venue_id, artist_ids)
         flash('Venue  was successfully deleted!')
     except:
         # if delete fails rollback and flash message
@@ -260,106 +246,43 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@response_cache.cached('artists')
 def artists():
 
-    data = []
-    # get all artists
-    artists = db.session.query(Artist.id, Artist.name).all()
+    # one page of artists ordered by name, and the genres to narrow them by;
+    # those are counted once per filter set, not again for every page
+    genres = genre_args()
+    page = queries.artists_page(after=request.args.get('after'),
+                                before=request.args.get('before'),
+                                limit=request.args.get('limit', type=int),
+                                **genres)
+    facets = response_cache.memoize('artist_genres', ['artists'],
+                                    queries.artist_genre_counts, **genres)
 
-    # append artists to data list
-    for artist in artists:
-        data.append({"id": artist.id, "name": artist.name})
-
-    return render_template('pages/artists.html', artists=data)
+    return render_template('pages/artists.html', artists=page['items'], page=page,
+                           facets=facets, **genres)
 
 
 @app.route('/artists/search', methods=['POST'])
 def search_artists():
 
-    # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
-    # search for "band" should return "The Wild Sax Band".
-
-    response = {}
-
-    search_term = request.form['search_term']
-
-    # to enable search all artist names that have the search_term
-    search_term = '%'+search_term+'%'
-
-    # search query
-    artists = db.session.query(Artist.id, Artist.name).filter(
-        Artist.name.ilike(search_term))
-
-    # No of artists
-    artists_count = artists.count()
-
-    response = {"count": artists_count}
-
-    response["data"] = []
-    # append artist in response
-    for artist in artists.all():
-        # aggregate number of supcoming shows per artist
-        num_upcoming_shows = Show.query.filter(Show.artist_id == artist.id).\
-            filter(Show.start_time >= datetime.today().date()).count()
-
-        artist_details = {'id': artist.id, "name": artist.name,
-                          "num_upcoming_shows": num_upcoming_shows}
-
-        response["data"].append(artist_details)
+    # search for matching artists with their upcoming show counts
+    # in a single aggregate query
+    response = queries.search_artists(request.form['search_term'], **genre_args())
 
     return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
 
 
 @app.route('/artists/<int:artist_id>')
+@conditional(queries.artist_version)
+@response_cache.cached('artist:{artist_id}')
 def show_artist(artist_id):
     # shows the artist page with the given artist_id
 
-    # get the artist
-    artist = Artist.query.get(artist_id)
-
-    # Venue details
-    data = {
-        "id": artist.id,
-        "name": artist.name,
-        "genres": artist.genres,
-
-        "city": artist.city,
-        "state": artist.state,
-        "phone": artist.phone,
-        "seeking_venue": artist.seeking_venue,
-        "facebook_link": artist.facebook_link,
-        "website": artist.website_link,
-        "image_link": artist.image_link
-    }
-    # Past Shows
-    data["past_shows"] = []
-    # past shows query
-    past_shows = db.session.query(Show).join(Artist).filter(Show.artist_id == artist.id).\
-        filter(Show.start_time < datetime.today().date())
-
-    for past_show in past_shows.all():
-        past_show_details = {"venue_id": past_show.Venue.id,
-                             "venue_name": past_show.Artist.name,
-                             "venue_image_link": past_show.Venue.image_link,
-                             "start_time": past_show.start_time}
-        data["past_shows"].append(past_show_details)
-
-    data["past_shows_count"] = past_shows.count()
-
-    # Artist Upcoming Shows
-
-    data["upcoming_shows"] = []
-    upcoming_shows = db.session.query(Show).join(Artist).filter(Show.artist_id == artist.id).\
-        filter(Show.start_time >= datetime.today().date())
-
-    for upcoming_show in upcoming_shows.all():
-        upcoming_shows_details = {"venue_id": upcoming_show.Venue.id,
-                                  "venue_name": upcoming_show.Venue.name,
-                                  "venue_image_link": upcoming_show.Venue.image_link,
-                                  "start_time": upcoming_show.start_time}
-        data["upcoming_shows"].append(upcoming_shows_details)
-
-    data["upcoming_shows_count"] = upcoming_shows.count()
+    # artist with all its shows, loaded eagerly
+    data = queries.artist_detail(artist_id)
+    if data is None:
+        abort(404)
 
     return render_template('pages/show_artist.html', artist=data)
 
@@ -394,6 +317,7 @@ def edit_artist_submission(artist_id):
             # on successful db update, flash success
 
             db.session.commit()
+            invalidate_artist(artist_id, queries.artist_venue_ids(artist_id))
             flash('Artist  was successfully Edited!')
     except:
         # on unsuccessful db insert, flash an error instead.
@@ -429,10 +353,15 @@ def edit_venue_submission(venue_id):
 
         try:
 
+            area = (venue.city, venue.state)
             form.populate_obj(venue)
+            # the venue may have moved to another area
+            if (venue.city, venue.state) != area:
+                queries.count_area_venues({area: -1, (venue.city, venue.state): 1})
             # on successful db update, flash success
 
             db.session.commit()
+            invalidate_venue(venue_id, queries.venue_artist_ids(venue_id))
             flash('Venue  was successfully Edited!')
         except:
             # on unsuccessful db insert, flash an error instead.
@@ -483,6 +412,7 @@ def create_artist_submission():
             # on successful db insert, flash success
             db.session.add(artist)
             db.session.commit()
+            response_cache.invalidate('artists')
             flash('Artist ' + request.form['name'] +
                   ' was successfully listed!')
         except:
@@ -503,27 +433,15 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@response_cache.cached('shows')
 def shows():
-    # displays list of shows at /shows
-
-    data = []
-
-    # query all shows
-    shows = Show.query.all()
-
-    # Populate data in dict and append to data list
-    for show in shows:
-        show_details = {
-            "venue_id": show.venue_id,
-            "venue_name": show.Venue.name,
-            "artist_id": show.artist_id,
-            "artist_name": show.Artist.name,
-            "artist_image_link": show.Artist.image_link,
-            "start_time": show.start_time}
+    # displays list of shows at /shows, one page at a time
 
-        data.append(show_details)
+    page = queries.shows_page(after=request.args.get('after'),
+                              before=request.args.get('before'),
+                              limit=request.args.get('limit', type=int))
 
-    return render_template('pages/shows.html', shows=data)
+    return render_template('pages/shows.html', shows=page['items'], page=page)
 
 
 @app.route('/shows/create')
@@ -539,16 +457,23 @@ def create_show_submission():
     form = ShowForm(request.form)
     if form.validate():
         try:
-            # validate data
-
-            show = Show(venue_id=form.venue_id.data,
-                        artist_id=form.artist_id.data,
-                        start_time=form.start_time.data)
-
-            # on successful db insert, flash success
-            db.session.add(show)
+            # the same checks as batch scheduling: both ends exist and
+            # neither the venue nor the artist is double booked
+            scheduled, rejected = scheduler.schedule_shows(
+                [(0, {"venue_id": form.venue_id.data,
+                      "artist_id": form.artist_id.data,
+                      "start_time": form.start_time.data})],
+                scheduler.show_duration())
             db.session.commit()
-            flash('Show was successfully listed!')
+
+            if scheduled:
+                # listings carry upcoming show counts, detail pages the show itself
+                response_cache.invalidate('shows', 'venues',
+                                          'venue:%s' % form.venue_id.data,
+                                          'artist:%s' % form.artist_id.data)
+                flash('Show was successfully listed!')
+            else:
+                flash('Show was NOT listed: %s' % rejected[0][1], 'error')
         except:
             # on unsuccessful db insert, flash an error instead.
             db.session.rollback()
@@ -563,6 +488,40 @@ def create_show_submission():
     return render_template('pages/home.html')
 
 
+#  Metrics
+#  ----------------------------------------------------------------
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # prometheus scrape target
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+#  Export
+#  ----------------------------------------------------------------
+
+@app.route('/export/<any(venues, artists, shows):kind>.<any(csv, jsonl):format>')
+def export(kind, format):
+    # streams the whole catalog (or a filtered slice of it) as CSV/JSONL,
+    # reading it from the database in batches
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.fromisoformat(start) if start else None
+        end = datetime.fromisoformat(end) if end else None
+    except ValueError:
+        abort(400)
+
+    query = exporter.export_query(kind, start=start, end=end,
+                                  city=request.args.get('city'),
+                                  state=request.args.get('state'),
+                                  genre=request.args.get('genre'))
+    generate, mimetype = exporter.FORMATS[format]
+
+    return Response(stream_with_context(generate(kind, query)), mimetype=mimetype,
+                    headers={'Content-Disposition': 'attachment; filename=%s.%s' % (kind, format)})
+
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
@@ -588,6 +547,9 @@ def server_error(error):
     return render_template('errors/500.html'), 500
 
 
+# flask CLI commands
+import commands
+
 if not app.debug:
     file_handler = FileHandler('error.log')
     file_handler.setFormatter(
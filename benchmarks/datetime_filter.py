@@ -0,0 +1,89 @@
+#----------------------------------------------------------------------------#
+# `datetime` filter micro-benchmark.
+#
+#   python -m benchmarks.datetime_filter [--tiles 10000] [--distinct 500]
+#
+# Renders the show tile markup of pages/shows.html for --tiles shows, drawn
+# from --distinct start times, with the original per-call babel filter and
+# with formatting.DateTimeFormatter. No database is needed.
+#----------------------------------------------------------------------------#
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+from jinja2 import Environment
+
+from formatting import DateTimeFormatter
+
+TILE = '''{% for show in shows %}
+<div class="col-sm-4">
+    <div class="tile tile-show">
+        <img src="{{ show.artist_image_link }}" alt="Artist Image" />
+        <h4>{{ show.start_time|datetime('full') }}</h4>
+        <h5><a href="/artists/{{ show.artist_id }}">{{ show.artist_name }}</a></h5>
+        <p>playing at</p>
+        <h5><a href="/venues/{{ show.venue_id }}">{{ show.venue_name }}</a></h5>
+    </div>
+</div>
+{% endfor %}'''
+
+
+def baseline_format_datetime(value, format='medium'):
+    # the filter as it was before DateTimeFormatter
+    if isinstance(value, str):
+        date = dateutil.parser.parse(value)
+    else:
+        date = value
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def render_time(filter, shows, repeat):
+    env = Environment()
+    env.filters['datetime'] = filter
+    template = env.from_string(TILE)
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        template.render(shows=shows)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Time rendering show tiles with both datetime filters.')
+    parser.add_argument('--tiles', type=int, default=10000)
+    parser.add_argument('--distinct', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    start = datetime(2026, 1, 1, 20, 0)
+    shows = [{"venue_id": i % 100, "venue_name": 'Venue %d' % (i % 100),
+              "artist_id": i % 300, "artist_name": 'Artist %d' % (i % 300),
+              "artist_image_link": 'https://example.com/%d.jpg' % (i % 300),
+              "start_time": start + timedelta(hours=i % args.distinct)}
+             for i in range(args.tiles)]
+
+    baseline = render_time(baseline_format_datetime, shows, args.repeat)
+    cold = DateTimeFormatter()
+    first = render_time(cold, shows, 1)
+    warm = render_time(cold, shows, args.repeat)
+    # a cache holding far fewer entries than there are distinct times
+    small = render_time(DateTimeFormatter(maxsize=16), shows, args.repeat)
+
+    print('%d tiles, %d distinct start times' % (args.tiles, args.distinct))
+    print('%-28s %10.1fms' % ('babel per call', baseline))
+    print('%-28s %10.1fms' % ('formatter, first render', first))
+    print('%-28s %10.1fms' % ('formatter, warm cache', warm))
+    print('%-28s %10.1fms' % ('formatter, 16 entry cache', small))
+
+
+if __name__ == '__main__':
+    main()
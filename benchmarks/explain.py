@@ -0,0 +1,112 @@
+#----------------------------------------------------------------------------#
+# Sequential scan check.
+#
+#   python -m benchmarks.explain [--min-rows 1000]
+#
+# Requests every read-only page and JSON API endpoint with the Flask test
+# client, records the SQL each one issues and runs EXPLAIN ANALYZE on it
+# against the configured database. Any sequential scan reading at least
+# --min-rows rows is reported and makes the script exit with status 1.
+#----------------------------------------------------------------------------#
+import argparse
+import json
+import sys
+
+from sqlalchemy import event
+
+from app import app
+from models import db, Venue, Artist, Area
+
+
+def sample_requests():
+    # every page the views and the JSON API serve, detail pages for the
+    # first venue/artist and the first area having venues
+    venue_id = db.session.query(db.func.min(Venue.id)).scalar() or 1
+    artist_id = db.session.query(db.func.min(Artist.id)).scalar() or 1
+    area_id = db.session.query(db.func.min(Area.id)).\
+        filter(Area.venue_count > 0).scalar() or 1
+    return [
+        ('GET', '/venues', None),
+        ('GET', '/venues/areas/%d' % area_id, None),
+        ('GET', '/artists', None),
+        ('GET', '/shows', None),
+        ('GET', '/venues/%d' % venue_id, None),
+        ('GET', '/artists/%d' % artist_id, None),
+        ('POST', '/venues/search', {'search_term': 'music'}),
+        ('POST', '/artists/search', {'search_term': 'band'}),
+        ('GET', '/api/v1/venues', None),
+        ('GET', '/api/v1/venues/genres', None),
+        ('GET', '/api/v1/venues/search?search_term=music', None),
+        ('GET', '/api/v1/venues/%d' % venue_id, None),
+        ('GET', '/api/v1/areas', None),
+        ('GET', '/api/v1/areas/%d/venues' % area_id, None),
+        ('GET', '/api/v1/artists', None),
+        ('GET', '/api/v1/artists/genres', None),
+        ('GET', '/api/v1/artists/search?search_term=band', None),
+        ('GET', '/api/v1/artists/%d' % artist_id, None),
+        ('GET', '/api/v1/shows', None),
+    ]
+
+
+def capture_statements(engine, method, path, form):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        client = app.test_client()
+        client.open(path, method=method, data=form)
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return statements
+
+
+def seq_scans(plan):
+    # walk the plan tree, yielding (table, rows read) for each Seq Scan
+    if plan.get('Node Type') == 'Seq Scan':
+        loops = plan.get('Actual Loops', 1)
+        read = (plan.get('Actual Rows', 0) + plan.get('Rows Removed by Filter', 0)) * loops
+        yield plan.get('Relation Name'), read
+    for child in plan.get('Plans', []):
+        yield from seq_scans(child)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Flag sequential scans in the queries issued by the views.')
+    parser.add_argument('--min-rows', type=int, default=1000,
+                        help='ignore sequential scans reading fewer rows')
+    args = parser.parse_args()
+
+    app.config['WTF_CSRF_ENABLED'] = False
+    flagged = 0
+
+    with app.app_context():
+        engine = db.get_engine()
+        for method, path, form in sample_requests():
+            for statement, parameters in capture_statements(engine, method, path, form):
+                # EXPLAIN ANALYZE executes the statement, keep it read only
+                if not statement.lstrip().upper().startswith('SELECT'):
+                    continue
+                with engine.connect() as conn:
+                    plan = conn.exec_driver_sql(
+                        'EXPLAIN (ANALYZE, FORMAT JSON) ' + statement, parameters).scalar()
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+                root = plan[0]['Plan']
+                for table, read in seq_scans(root):
+                    if read >= args.min_rows:
+                        flagged += 1
+                        print('%s %s: Seq Scan on %s (%d rows)' % (method, path, table, read))
+                        print('    ' + ' '.join(statement.split()))
+                print('%s %s %.1fms' % (method, path, plan[0].get('Execution Time', 0)))
+
+    if flagged:
+        print('%d sequential scan(s) found' % flagged)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#----------------------------------------------------------------------------#
+# HTML vs JSON render benchmark.
+#
+#   python -m benchmarks.render [--repeat 50]
+#
+# Requests each HTML page and the /api/v1 requests returning the same data
+# with the Flask test client against the configured database
+# (BENCH_DATABASE_URI overrides it) and prints the median and p95 time of
+# each side. The response cache is turned off so every request runs its
+# queries and renders.
+#----------------------------------------------------------------------------#
+import argparse
+import os
+import statistics
+import time
+
+import app as fyyur
+from models import db, Venue, Artist, Area
+
+
+def pairs():
+    # each HTML page against the JSON requests returning the same data; the
+    # listings' genre facets come from a separate endpoint in the API
+    venue_id = db.session.query(db.func.min(Venue.id)).scalar() or 1
+    artist_id = db.session.query(db.func.min(Artist.id)).scalar() or 1
+    area_id = db.session.query(db.func.min(Area.id)).\
+        filter(Area.venue_count > 0).scalar() or 1
+    return [
+        ('areas', [('GET', '/venues', None)],
+         [('GET', '/api/v1/areas', None), ('GET', '/api/v1/venues/genres', None)]),
+        ('area venues', [('GET', '/venues/areas/%d' % area_id, None)],
+         [('GET', '/api/v1/areas/%d/venues' % area_id, None)]),
+        ('artists', [('GET', '/artists', None)],
+         [('GET', '/api/v1/artists', None), ('GET', '/api/v1/artists/genres', None)]),
+        ('shows', [('GET', '/shows', None)], [('GET', '/api/v1/shows', None)]),
+        ('venue detail', [('GET', '/venues/%d' % venue_id, None)],
+         [('GET', '/api/v1/venues/%d' % venue_id, None)]),
+        ('artist detail', [('GET', '/artists/%d' % artist_id, None)],
+         [('GET', '/api/v1/artists/%d' % artist_id, None)]),
+        ('venue search', [('POST', '/venues/search', {'search_term': 'a'})],
+         [('GET', '/api/v1/venues/search?search_term=a', None)]),
+        ('artist search', [('POST', '/artists/search', {'search_term': 'a'})],
+         [('GET', '/api/v1/artists/search?search_term=a', None)]),
+    ]
+
+
+def timed(client, requests, repeat):
+    # one sample covers all of `requests`
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        responses = [client.open(path, method=method, data=data)
+                     for method, path, data in requests]
+        samples.append((time.perf_counter() - started) * 1000)
+        for (_, path, _), response in zip(requests, responses):
+            assert response.status_code == 200, (path, response.status_code)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compare HTML and JSON response times per endpoint.')
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    app = fyyur.app
+    if os.environ.get('BENCH_DATABASE_URI'):
+        app.config['SQLALCHEMY_DATABASE_URI'] = os.environ['BENCH_DATABASE_URI']
+    app.config['WTF_CSRF_ENABLED'] = False
+    fyyur.response_cache.backend = None
+
+    client = app.test_client()
+    print('%-14s %10s %10s %10s %10s' % ('endpoint', 'html p50', 'html p95', 'json p50', 'json p95'))
+    with app.app_context():
+        endpoints = pairs()
+    for name, html_requests, api_requests in endpoints:
+        html = timed(client, html_requests, args.repeat)
+        api = timed(client, api_requests, args.repeat)
+        print('%-14s %8.2fms %8.2fms %8.2fms %8.2fms' % ((name,) + html + api))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import functools
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+
+from flask import abort, g, has_request_context, make_response, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+#----------------------------------------------------------------------------#
+# Backends.
+#----------------------------------------------------------------------------#
+
+
+class LRUBackend:
+    """In-process cache holding at most `max_entries` pages.
+
+    Tag versions live outside the LRU so evicting a page can never reset
+    a version and bring a stale page back.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def versions(self, tags):
+        return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+
+class RedisBackend:
+    """Cache shared between workers through a Redis compatible `client`.
+
+    Only get/set/mget/incr are used, so any object providing them (a local
+    fake included) can stand in for a real redis.Redis client.
+    """
+
+    def __init__(self, client, prefix='fyyur:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, timeout):
+        self.client.set(self.prefix + key, value.encode('utf-8'), ex=timeout)
+
+    def versions(self, tags):
+        if not tags:
+            return []
+        values = self.client.mget([self.prefix + 'tag:' + tag for tag in tags])
+        return [int(value or 0) for value in values]
+
+    def bump(self, tags):
+        for tag in tags:
+            self.client.incr(self.prefix + 'tag:' + tag)
+
+
+#----------------------------------------------------------------------------#
+# Response cache.
+#----------------------------------------------------------------------------#
+
+
+def _skipped():
+    # set by routing.ReplicaRouter when the request's reads may lag behind
+    # a recent write
+    return has_request_context() and g.get('skip_response_cache', False)
+
+
+class ResponseCache:
+    """Caches rendered pages keyed by path, query string and tag versions.
+
+    Views declare the tags their page depends on, e.g. 'venue:{venue_id}'.
+    Write paths call `invalidate` with the tags they touched once their
+    commit succeeded, which bumps the tag versions and so changes the key
+    of every page depending on them.
+
+    CACHE_TYPE selects the backend: 'lru' (default), 'redis' (needs the
+    redis package and CACHE_REDIS_URL) or 'null' to disable caching.
+    """
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.fragments = None
+        self.timeout = 300
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, backend=None):
+        self.timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 300)
+        cache_type = app.config.get('CACHE_TYPE', 'lru')
+
+        # template fragments always stay in-process, see FragmentCache
+        app.jinja_env.add_extension(FragmentCache)
+        if app.config.get('FRAGMENT_CACHE_ENABLED', True):
+            self.fragments = LRUBackend(app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 4096))
+            app.jinja_env.fragment_cache = self.fragments
+            app.jinja_env.fragment_cache_timeout = app.config.get(
+                'FRAGMENT_CACHE_TIMEOUT', self.timeout)
+
+        if backend is not None:
+            self.backend = backend
+        elif cache_type == 'lru':
+            self.backend = LRUBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        elif cache_type == 'redis':
+            import redis
+            self.backend = RedisBackend(
+                redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+        else:
+            self.backend = None
+
+        app.extensions['response_cache'] = self
+
+    def cached(self, *tags):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(**kwargs):
+                # pages carrying flashed messages are per-user, never cache them
+                if self.backend is None or request.method != 'GET' or '_flashes' in session \
+                        or _skipped():
+                    return view(**kwargs)
+
+                page_tags = [tag.format(**kwargs) for tag in tags]
+                versions = self.backend.versions(page_tags)
+                # under `conditional` the page's database version is part of
+                # the key too: writes that bypass `invalidate` (CLI imports,
+                # other workers' LRU caches) still get a fresh page
+                key = 'view:%s?%s|%s|%s' % (
+                    request.path,
+                    request.query_string.decode('utf-8'),
+                    ','.join('%s=%d' % pair for pair in zip(page_tags, versions)),
+                    g.get('page_etag', ''))
+
+                body = self.backend.get(key)
+                if body is None:
+                    body = view(**kwargs)
+                    if isinstance(body, str) and not _skipped():
+                        self.backend.set(key, body, self.timeout)
+                return body
+            return wrapper
+        return decorator
+
+    def memoize(self, name, tags, compute, **kwargs):
+        """`compute(**kwargs)`, kept until one of `tags` is bumped.
+
+        For results shared by many pages, such as the genre facets of a
+        listing that every keyset page shows. The result must be JSON
+        serializable.
+        """
+        if self.backend is None or _skipped():
+            return compute(**kwargs)
+
+        versions = self.backend.versions(tags)
+        key = 'value:%s:%s|%s' % (
+            name, json.dumps(kwargs, sort_keys=True),
+            ','.join('%s=%d' % pair for pair in zip(tags, versions)))
+
+        value = self.backend.get(key)
+        if value is None:
+            result = compute(**kwargs)
+            if not _skipped():
+                self.backend.set(key, json.dumps(result), self.timeout)
+            return result
+        return json.loads(value)
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.bump(tags)
+        if self.fragments is not None and tags:
+            self.fragments.bump(tags)
+
+
+#----------------------------------------------------------------------------#
+# Fragment cache.
+#----------------------------------------------------------------------------#
+
+
+class FragmentCache(Extension):
+    """Jinja `{% cache %}` tag reusing rendered markup across requests.
+
+        {% cache show.artist_id, show.artist_updated_at, show.start_time
+           versions 'artist:' ~ show.artist_id %}
+            ...tile markup...
+        {% endcache %}
+
+    The key is the template, the tag's position in it and the values
+    listed; the `versions` part names response cache tags, so the writes
+    invalidating a page (see ResponseCache.invalidate) also change the key
+    of every fragment depending on the same entities. Those versions only
+    move in the worker that made the write, so the values listed should
+    include the `updated_at` of every row the fragment shows: writes from
+    other workers or the CLI change the key through them. Fragments live
+    in a bounded LRUBackend per worker; without one the body always
+    renders.
+    """
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None, fragment_cache_timeout=300)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [nodes.Const('%s:%d' % (parser.name, lineno))]
+        key.append(parser.parse_expression())
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        tags = []
+        if parser.stream.skip_if('name:versions'):
+            tags.append(parser.parse_expression())
+            while parser.stream.skip_if('comma'):
+                tags.append(parser.parse_expression())
+
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+
+        # a hit outputs the stored markup without setting up a caller for
+        # the body, only a miss renders it and stores the result:
+        #   {% set key, fragment = lookup(...) %}
+        #   {% if fragment is none %}{% call store(key) %}body{% endcall %}
+        #   {% else %}{{ fragment }}{% endif %}
+        found = nodes.Assign(
+            nodes.Tuple([nodes.Name('_fragment_key', 'store'),
+                         nodes.Name('_fragment', 'store')], 'store'),
+            self.call_method('_lookup', [nodes.List(key), nodes.List(tags)]))
+        miss = nodes.CallBlock(
+            self.call_method('_store', [nodes.Name('_fragment_key', 'load')]),
+            [], [], body)
+        render = nodes.If(nodes.Test(nodes.Name('_fragment', 'load'), 'none', [], [], None, None),
+                          [miss], [], [nodes.Output([nodes.Name('_fragment', 'load')])])
+        return [found.set_lineno(lineno), render.set_lineno(lineno)]
+
+    def _lookup(self, key, tags):
+        store = self.environment.fragment_cache
+        if store is None or _skipped():
+            return None, None
+        versions = store.versions(tags)
+        key = 'fragment:%s|%s' % ('|'.join(map(str, key)), ','.join(
+            '%s=%d' % pair for pair in zip(tags, versions)))
+        return key, store.get(key)
+
+    def _store(self, key, caller):
+        # caller() hands back Markup, which is what gets stored and output
+        fragment = caller()
+        if key is not None and not _skipped():
+            self.environment.fragment_cache.set(
+                key, fragment, self.environment.fragment_cache_timeout)
+        return fragment
+
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#----------------------------------------------------------------------------#
+
+
+def conditional(version):
+    """Answer If-None-Match/If-Modified-Since before the view runs.
+
+    `version(**view_args)` returns (etag, last_modified) for the page, or
+    None when the entity does not exist. Unchanged pages get a 304
+    without running the view's queries or rendering its template.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            # pages carrying flashed messages are per-user, always render them
+            if '_flashes' in session:
+                return view(**kwargs)
+
+            current = version(**kwargs)
+            if current is None:
+                abort(404)
+            etag, last_modified = current
+            last_modified = last_modified.replace(tzinfo=timezone.utc)
+            # ResponseCache.cached keys the page on it, so the body served
+            # always matches the ETag sent with it
+            g.page_etag = etag
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = request.if_modified_since is not None and \
+                    last_modified <= request.if_modified_since
+
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(**kwargs))
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
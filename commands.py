@@ -0,0 +1,210 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import json
+import time
+from datetime import timedelta
+
+import click
+from flask.cli import AppGroup
+from wtforms.validators import ValidationError
+
+from models import app, db, upcoming_since
+import exporter
+import importer
+import queries
+import scheduler
+import templating
+
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+counters = AppGroup('counters', help='Maintain the upcoming show counters.')
+app.cli.add_command(counters)
+
+
+@counters.command('roll')
+@click.option('--days', default=1, show_default=True,
+              help='How many days of shows that became past to roll over.')
+def roll_counters(days):
+    """Move shows that started since the last run from upcoming to past.
+
+    Shows become past as soon as they start, so run it from cron often
+    (every few minutes) to keep the listings' counts current.
+    """
+    since = upcoming_since() - timedelta(days=days)
+    venues, artists = queries.roll_upcoming_counts(since)
+    db.session.commit()
+    click.echo('refreshed %d venues and %d artists' % (venues, artists))
+
+
+@counters.command('check')
+@click.option('--fix', is_flag=True, help='Recompute the counters that drifted.')
+def check_counters(fix):
+    """Recompute every counter from scratch and report drift."""
+    drift = queries.upcoming_counts_drift()
+    for kind, entity_id, stored, actual in drift:
+        click.echo('%s %d: stored %d, actual %d' % (kind, entity_id, stored, actual))
+
+    if drift and fix:
+        queries.refresh_upcoming_counts(
+            venue_ids=[entity_id for kind, entity_id, _, _ in drift if kind == 'venue'],
+            artist_ids=[entity_id for kind, entity_id, _, _ in drift if kind == 'artist'])
+        db.session.commit()
+        click.echo('fixed %d counters' % len(drift))
+    elif drift:
+        click.echo('%d counters drifted' % len(drift))
+        raise SystemExit(1)
+    else:
+        click.echo('all counters are consistent')
+
+
+#----------------------------------------------------------------------------#
+# Venue areas.
+#----------------------------------------------------------------------------#
+
+areas = AppGroup('areas', help='Maintain the venue area directory.')
+app.cli.add_command(areas)
+
+
+@areas.command('refresh')
+def refresh_areas():
+    """Recount the venues of every area, adding missing areas.
+
+    The views keep the areas current; run this after changing venues
+    outside the app.
+    """
+    queries.refresh_areas()
+    db.session.commit()
+    click.echo('refreshed %d areas' % len(queries.area_index()))
+
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('import')
+@click.argument('kind', type=click.Choice(sorted(importer.KINDS)))
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format, guessed from the file extension by default.')
+@click.option('--chunk-size', default=5000, show_default=True,
+              help='Rows validated and committed per batch.')
+@click.option('--method', type=click.Choice(['auto', 'copy', 'insert']),
+              default='auto', show_default=True,
+              help='COPY on PostgreSQL, batched INSERTs elsewhere.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'),
+              help='Write rejected rows as JSON lines to this file.')
+def import_command(kind, source, format, chunk_size, method, rejects):
+    """Stream venues, artists or shows from a CSV or JSONL file."""
+    if format is None:
+        format = 'csv' if source.name.endswith('.csv') else 'jsonl'
+
+    def on_reject(line_num, error):
+        if rejects:
+            rejects.write(json.dumps({"line": line_num, "error": error}) + '\n')
+        else:
+            click.echo('line %d: %s' % (line_num, error), err=True)
+
+    loaded, rejected, seconds = importer.import_rows(
+        kind, importer.read_rows(source, format),
+        chunk_size=chunk_size, method=method, on_reject=on_reject)
+
+    click.echo('loaded %d %s, rejected %d in %.1fs (%.0f rows/s)' % (
+        loaded, kind, rejected, seconds, (loaded + rejected) / seconds if seconds else 0))
+
+
+#----------------------------------------------------------------------------#
+# Batch scheduling.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('schedule')
+@click.argument('source', type=click.File('r', encoding='utf-8'))
+@click.option('--format', 'format', type=click.Choice(['csv', 'jsonl']),
+              help='Input format, guessed from the file extension by default.')
+@click.option('--strict', is_flag=True,
+              help='Schedule nothing if any show is rejected.')
+@click.option('--rejects', type=click.File('w', encoding='utf-8'),
+              help='Write rejected rows as JSON lines to this file.')
+def schedule_command(source, format, strict, rejects):
+    """Schedule a batch of shows in one transaction, refusing double bookings."""
+    if format is None:
+        format = 'csv' if source.name.endswith('.csv') else 'jsonl'
+
+    started = time.perf_counter()
+    rows, rejected = [], []
+    for line_num, row in importer.read_rows(source, format):
+        try:
+            rows.append((line_num, importer.clean_show(row)))
+        except ValidationError as error:
+            rejected.append((line_num, str(error)))
+
+    scheduled = []
+    if not (strict and rejected):
+        scheduled, conflicts = scheduler.schedule_shows(
+            rows, scheduler.show_duration(), strict=strict)
+        rejected += conflicts
+    db.session.commit()
+
+    for line_num, error in sorted(rejected):
+        if rejects:
+            rejects.write(json.dumps({"line": line_num, "error": error}) + '\n')
+        else:
+            click.echo('line %d: %s' % (line_num, error), err=True)
+
+    click.echo('scheduled %d shows, rejected %d in %.1fs' % (
+        len(scheduled), len(rejected), time.perf_counter() - started))
+    if rejected:
+        raise SystemExit(1)
+
+
+#----------------------------------------------------------------------------#
+# Bulk export.
+#----------------------------------------------------------------------------#
+
+
+@app.cli.command('export')
+@click.argument('kind', type=click.Choice(sorted(exporter.COLUMNS)))
+@click.option('--format', 'format', type=click.Choice(sorted(exporter.FORMATS)),
+              default='jsonl', show_default=True)
+@click.option('--output', type=click.File('w', encoding='utf-8'), default='-',
+              help='File to write to, stdout by default.')
+@click.option('--start', type=click.DateTime(), help='Shows starting from this time.')
+@click.option('--end', type=click.DateTime(), help='Shows starting before this time.')
+@click.option('--city')
+@click.option('--state')
+@click.option('--genre')
+def export_command(kind, format, output, start, end, city, state, genre):
+    """Stream venues, artists or shows to CSV or JSONL in constant memory."""
+    query = exporter.export_query(kind, start=start, end=end,
+                                  city=city, state=state, genre=genre)
+    generate, _ = exporter.FORMATS[format]
+    for chunk in generate(kind, query):
+        output.write(chunk)
+
+
+#----------------------------------------------------------------------------#
+# Templates.
+#----------------------------------------------------------------------------#
+
+templates = AppGroup('templates', help='Manage the compiled templates.')
+app.cli.add_command(templates)
+
+
+@templates.command('compile')
+def compile_templates():
+    """Compile every template into TEMPLATE_BYTECODE_CACHE_DIR.
+
+    Run it as a build/deploy step so new workers load compiled templates
+    instead of compiling them on their first requests.
+    """
+    try:
+        count, elapsed = templating.compile_templates(app)
+    except RuntimeError as error:
+        raise click.ClickException(str(error))
+    click.echo('compiled %d templates into %s in %.1fms' % (
+        count, app.config['TEMPLATE_BYTECODE_CACHE_DIR'], elapsed * 1000))
@@ -0,0 +1,110 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import csv
+import io
+import json
+from datetime import datetime
+
+from models import db, Venue, Artist, Show
+
+
+#----------------------------------------------------------------------------#
+# Queries.
+#----------------------------------------------------------------------------#
+
+# columns written for each kind, in the order the importer reads them
+COLUMNS = {
+    'venues': ['id', 'name', 'city', 'state', 'address', 'phone', 'genres',
+               'image_link', 'facebook_link', 'website_link',
+               'seeking_talent', 'seeking_description'],
+    'artists': ['id', 'name', 'city', 'state', 'phone', 'genres',
+                'image_link', 'facebook_link', 'website_link',
+                'seeking_venue', 'seeking_description'],
+    'shows': ['id', 'venue_id', 'artist_id', 'start_time'],
+}
+
+# rows fetched per round trip from the server-side cursor
+BATCH_SIZE = 1000
+
+
+def export_query(kind, start=None, end=None, city=None, state=None, genre=None):
+    """Column query for `kind` with every filter applied in SQL.
+
+    start/end bound Show.start_time, city/state match the venue (or the
+    artist's home town) and genre must be one of the entity's genres.
+    Shows are filtered on their venue's city/state and artist's genres.
+    """
+    model = {'venues': Venue, 'artists': Artist, 'shows': Show}[kind]
+    query = db.session.query(*[getattr(model, column) for column in COLUMNS[kind]])
+
+    if kind == 'shows':
+        if start is not None:
+            query = query.filter(Show.start_time >= start)
+        if end is not None:
+            query = query.filter(Show.start_time < end)
+        if city is not None or state is not None:
+            query = query.join(Venue, Show.venue_id == Venue.id)
+        if genre is not None:
+            query = query.join(Artist, Show.artist_id == Artist.id)
+        area, genres = Venue, Artist.genres
+    else:
+        area, genres = model, model.genres
+
+    if city is not None:
+        query = query.filter(area.city == city)
+    if state is not None:
+        query = query.filter(area.state == state)
+    if genre is not None:
+        query = query.filter(genres.contains([genre]))
+
+    # stream from a server-side cursor instead of buffering every row
+    return query.order_by(model.id).yield_per(BATCH_SIZE)
+
+
+#----------------------------------------------------------------------------#
+# Formats.
+#----------------------------------------------------------------------------#
+
+
+def _plain(value, format):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, list) and format == 'csv':
+        return ','.join(value)
+    return value
+
+
+def iter_csv(kind, query):
+    """Yield the rows of `query` as CSV text, header first."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS[kind])
+    for count, row in enumerate(query, start=1):
+        writer.writerow([_plain(value, 'csv') for value in row])
+        # hand the text over in batches rather than per row
+        if count % BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_jsonl(kind, query):
+    """Yield the rows of `query` as JSON lines."""
+    columns = COLUMNS[kind]
+    lines = []
+    for row in query:
+        lines.append(json.dumps({column: _plain(value, 'jsonl')
+                                 for column, value in zip(columns, row)}))
+        if len(lines) == BATCH_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'jsonl': (iter_jsonl, 'application/x-ndjson'),
+}
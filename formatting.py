@@ -0,0 +1,53 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import dateutil.parser
+from babel import Locale
+from babel.dates import format_datetime, parse_pattern
+
+
+#----------------------------------------------------------------------------#
+# Date/time formatting.
+#----------------------------------------------------------------------------#
+
+
+class DateTimeFormatter:
+    """Jinja `datetime` filter with precompiled patterns and memoized output.
+
+    The named formats are parsed into babel patterns once, datetime values
+    are formatted without going through dateutil, and results are kept in
+    an LRU of `maxsize` entries since the same show times repeat across
+    tiles and requests.
+    """
+
+    FORMATS = {
+        'full': "EEEE MMMM, d, y 'at' h:mma",
+        'medium': "EE MM, dd, y h:mma",
+    }
+
+    def __init__(self, locale='en', maxsize=4096):
+        self.locale = Locale.parse(locale)
+        self.patterns = {name: parse_pattern(pattern)
+                         for name, pattern in self.FORMATS.items()}
+        self._format = lru_cache(maxsize=maxsize)(self._format_uncached)
+
+    def __call__(self, value, format='medium'):
+        # allow even datetime objects to be passed
+        return self._format(value, format)
+
+    def _format_uncached(self, value, format):
+        date = dateutil.parser.parse(value) if isinstance(value, str) else value
+        pattern = self.patterns.get(format)
+        if pattern is None:
+            # babel's own named formats ('long', 'short') or a custom pattern
+            return format_datetime(date, format, locale=self.locale)
+        if isinstance(date, datetime) and date.tzinfo is None:
+            # babel treats naive datetimes as UTC
+            date = date.replace(tzinfo=timezone.utc)
+        return pattern.apply(date, self.locale)
+
+    def cache_info(self):
+        return self._format.cache_info()
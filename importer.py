@@ -0,0 +1,300 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import csv
+import io
+import json
+import time
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from wtforms.validators import URL, ValidationError
+
+from forms import Genre, states, validate_phone
+from models import db, Venue, Artist, Show, as_utc
+import queries
+
+
+#----------------------------------------------------------------------------#
+# Reading.
+#----------------------------------------------------------------------------#
+
+
+class _Unreadable:
+    # stands in for a JSONL line that does not parse, clean_* rejects it
+    def __init__(self, error):
+        self.error = error
+
+
+def read_rows(stream, format):
+    """Yield (line number, row dict) from a CSV or JSONL text stream.
+
+    Malformed JSONL lines are yielded too, for the clean_* functions to
+    reject with their line number instead of ending the import.
+    """
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_num, line in enumerate(stream, start=1):
+            if line.strip():
+                try:
+                    yield line_num, json.loads(line.rstrip('\r\n'))
+                except json.JSONDecodeError as error:
+                    yield line_num, _Unreadable(error)
+
+
+#----------------------------------------------------------------------------#
+# Validation.
+#----------------------------------------------------------------------------#
+
+
+class _Field:
+    # just enough of a wtforms field to run the forms.py validators on
+    def __init__(self, data):
+        self.data = data
+
+    def gettext(self, string):
+        return string
+
+
+GENRES = {genre.value for genre in Genre}
+_url = URL()
+
+
+def _record(row):
+    if isinstance(row, _Unreadable):
+        raise ValidationError('invalid JSON at column %d: %s' % (row.error.colno, row.error.msg))
+    if not isinstance(row, dict):
+        raise ValidationError('expected an object, got %s' % type(row).__name__)
+    return row
+
+
+def _text(row, name, required=False, max_length=None):
+    value = row.get(name)
+    value = str(value).strip() if value is not None else None
+    if not value:
+        if required:
+            raise ValidationError('%s is required' % name)
+        return None
+    if max_length and len(value) > max_length:
+        raise ValidationError('%s is longer than %d characters' % (name, max_length))
+    return value
+
+
+def _link(row, name):
+    value = _text(row, name)
+    if value is not None:
+        _url(None, _Field(value))
+    return value
+
+
+def _boolean(row, name):
+    value = row.get(name)
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'y', 'yes', 'on')
+    return bool(value)
+
+
+def _genres(row):
+    # a list in JSONL, comma separated in CSV
+    value = row.get('genres') or []
+    if isinstance(value, str):
+        value = [genre.strip() for genre in value.split(',') if genre.strip()]
+    if not value:
+        raise ValidationError('genres is required')
+    unknown = [genre for genre in value if genre not in GENRES]
+    if unknown:
+        raise ValidationError('unknown genres: %s' % ', '.join(unknown))
+    return list(value)
+
+
+def _state(row):
+    value = _text(row, 'state', required=True)
+    if value not in states:
+        raise ValidationError('invalid state %s' % value)
+    return value
+
+
+def _phone(row):
+    value = _text(row, 'phone', required=True)
+    validate_phone(None, _Field(value))
+    return value
+
+
+def clean_venue(row):
+    row = _record(row)
+    return {
+        "name": _text(row, 'name', required=True, max_length=120),
+        "city": _text(row, 'city', required=True, max_length=120),
+        "state": _state(row),
+        "address": _text(row, 'address', required=True, max_length=120),
+        "phone": _phone(row),
+        "genres": _genres(row),
+        "image_link": _link(row, 'image_link'),
+        "facebook_link": _link(row, 'facebook_link'),
+        "website_link": _link(row, 'website_link'),
+        "seeking_talent": _boolean(row, 'seeking_talent'),
+        "seeking_description": _text(row, 'seeking_description', max_length=120),
+    }
+
+
+def clean_artist(row):
+    row = _record(row)
+    return {
+        "name": _text(row, 'name', required=True),
+        "city": _text(row, 'city', required=True, max_length=120),
+        "state": _state(row),
+        "phone": _phone(row),
+        "genres": _genres(row),
+        "image_link": _link(row, 'image_link'),
+        "facebook_link": _link(row, 'facebook_link'),
+        "website_link": _link(row, 'website_link'),
+        "seeking_venue": _boolean(row, 'seeking_venue'),
+        "seeking_description": _text(row, 'seeking_description', max_length=500),
+    }
+
+
+def clean_show(row):
+    row = _record(row)
+    try:
+        venue_id = int(row.get('venue_id'))
+        artist_id = int(row.get('artist_id'))
+    except (TypeError, ValueError):
+        raise ValidationError('venue_id and artist_id must be integers')
+    start_time = _text(row, 'start_time', required=True)
+    try:
+        # naive times are UTC, as on every other path
+        start_time = as_utc(datetime.fromisoformat(start_time))
+    except ValueError:
+        raise ValidationError('start_time must be an ISO 8601 datetime')
+    return {"venue_id": venue_id, "artist_id": artist_id, "start_time": start_time}
+
+
+#----------------------------------------------------------------------------#
+# Loading.
+#----------------------------------------------------------------------------#
+
+
+KINDS = {
+    'venues': (Venue, clean_venue),
+    'artists': (Artist, clean_artist),
+    'shows': (Show, clean_show),
+}
+
+
+def _copy_value(value):
+    # values as postgres reads them from COPY ... (FORMAT csv)
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, list):
+        return '{%s}' % ','.join('"%s"' % item.replace('\\', '\\\\').replace('"', '\\"')
+                                 for item in value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return value
+
+
+def _copy(table, rows):
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert('COPY "%s" (%s) FROM STDIN WITH (FORMAT csv)' % (
+        table.name, ', '.join('"%s"' % column for column in columns)), buffer)
+
+
+def load_chunk(kind, rows, method):
+    """Insert one chunk of cleaned rows and commit it.
+
+    Returns the (line number, error) pairs rejected while loading.
+    """
+    model, _ = KINDS[kind]
+    rejected = []
+
+    if kind == 'shows':
+        missing_venues, missing_artists = queries.missing_references(
+            [row['venue_id'] for _, row in rows], [row['artist_id'] for _, row in rows])
+        accepted = []
+        for line_num, row in rows:
+            if row['venue_id'] in missing_venues:
+                rejected.append((line_num, 'venue %d does not exist' % row['venue_id']))
+            elif row['artist_id'] in missing_artists:
+                rejected.append((line_num, 'artist %d does not exist' % row['artist_id']))
+            else:
+                accepted.append((line_num, row))
+        rows = accepted
+
+    values = [row for _, row in rows]
+    if values:
+        if method == 'copy':
+            _copy(model.__table__, values)
+        else:
+            db.session.execute(model.__table__.insert(), values)
+
+        if kind == 'shows':
+            # bulk inserts skip the Show listeners maintaining the counters
+            queries.refresh_upcoming_counts(
+                venue_ids=sorted({row['venue_id'] for row in values}),
+                artist_ids=sorted({row['artist_id'] for row in values}))
+        elif kind == 'venues':
+            queries.count_area_venues(Counter((row['city'], row['state']) for row in values))
+
+    db.session.commit()
+    return rejected
+
+
+def import_rows(kind, rows, chunk_size=5000, method='auto', on_reject=None):
+    """Validate and load `rows` (line number, dict) in chunks of `chunk_size`.
+
+    `method` is 'copy' (PostgreSQL COPY), 'insert' (batched executemany)
+    or 'auto'. Rows are streamed, so only one chunk is held in memory.
+    `on_reject(line_num, error)` is called for every rejected row.
+    Returns (loaded, rejected, seconds).
+    """
+    _, clean = KINDS[kind]
+    if method == 'auto':
+        method = 'copy' if db.get_engine().dialect.name == 'postgresql' else 'insert'
+
+    loaded = rejected = 0
+    started = time.perf_counter()
+    rows = iter(rows)
+
+    while True:
+        batch = list(islice(rows, chunk_size))
+        if not batch:
+            break
+
+        chunk = []
+        for line_num, row in batch:
+            try:
+                chunk.append((line_num, clean(row)))
+            except ValidationError as error:
+                rejected += 1
+                if on_reject:
+                    on_reject(line_num, str(error))
+        if not chunk:
+            continue
+
+        try:
+            failures = load_chunk(kind, chunk, method)
+        except Exception as error:
+            # a database error fails the whole chunk, keep going with the next
+            db.session.rollback()
+            failures = [(line_num, 'chunk failed: %s' % error) for line_num, _ in chunk]
+
+        for line_num, error in failures:
+            if on_reject:
+                on_reject(line_num, error)
+        rejected += len(failures)
+        loaded += len(chunk) - len(failures)
+
+    return loaded, rejected, time.perf_counter() - started
@@ -0,0 +1,366 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import bisect
+import threading
+import time
+import weakref
+
+from flask import g, request
+from jinja2 import Template
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+
+#----------------------------------------------------------------------------#
+# Metric types.
+#----------------------------------------------------------------------------#
+
+
+class _Token:
+    # kept in the thread-local next to a shard, goes away with the thread
+    __slots__ = ('__weakref__',)
+
+
+class _Sharded:
+    """Per-thread value shards, summed when the metric is rendered.
+
+    Each thread updates only its own shard, so observing takes no lock;
+    the lock is held once per thread to register its shard, when the
+    thread ends and its shard is folded into the base totals, and while
+    rendering. Thread-per-request servers so keep one shard per live
+    thread rather than one per thread ever started.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._base = [0] * size
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = [0] * self._size
+            token = self._local.token = _Token()
+            with self._lock:
+                self._shards[id(shard)] = shard
+            weakref.finalize(token, self._retire, shard).atexit = False
+        return shard
+
+    def _retire(self, shard):
+        # the owning thread is gone, nothing writes to the shard any more
+        with self._lock:
+            del self._shards[id(shard)]
+            self._base = [total + value for total, value in zip(self._base, shard)]
+
+    def _totals(self):
+        with self._lock:
+            shards = [self._base] + list(self._shards.values())
+        return [sum(column) for column in zip(*shards)]
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('"', '\\"'))
+                             for name, value in labels)
+
+
+class Counter(_Sharded):
+    def __init__(self, name, help):
+        super().__init__(1)
+        self.name = name
+        self.help = help
+
+    @property
+    def value(self):
+        return self._totals()[0]
+
+    def inc(self, amount=1):
+        self._shard()[0] += amount
+
+    def samples(self, labels=()):
+        return ['%s%s %s' % (self.name, _labels(labels), self.value)]
+
+    def render(self):
+        return ['# HELP %s %s' % (self.name, self.help),
+                '# TYPE %s counter' % self.name] + self.samples()
+
+
+class Histogram(_Sharded):
+    # seconds, from sub-millisecond pool checkouts up to slow requests
+    BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+               0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name, help, buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # one slot per bucket, the +Inf bucket and the sum
+        super().__init__(len(self.buckets) + 2)
+
+    def observe(self, value):
+        shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def samples(self, labels=()):
+        totals = self._totals()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), totals):
+            cumulative += count
+            lines.append('%s_bucket%s %d' % (
+                self.name, _labels(tuple(labels) + (('le', bound),)), cumulative))
+        lines.append('%s_sum%s %s' % (self.name, _labels(labels), totals[-1]))
+        lines.append('%s_count%s %d' % (self.name, _labels(labels), cumulative))
+        return lines
+
+    def render(self):
+        return ['# HELP %s %s' % (self.name, self.help),
+                '# TYPE %s histogram' % self.name] + self.samples()
+
+
+class Family:
+    """A Counter or Histogram split by label values, e.g. per endpoint."""
+
+    def __init__(self, metric, name, help, labelnames, **kwargs):
+        self.metric = metric
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.kwargs = kwargs
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(
+                    values, self.metric(self.name, self.help, **self.kwargs))
+        return child
+
+    def render(self):
+        kind = 'counter' if self.metric is Counter else 'histogram'
+        lines = ['# HELP %s %s' % (self.name, self.help),
+                 '# TYPE %s %s' % (self.name, kind)]
+        for values, child in sorted(self._children.items(), key=lambda item: str(item[0])):
+            lines += child.samples(tuple(zip(self.labelnames, values)))
+        return lines
+
+
+def _gauge(name, help, value):
+    return ['# HELP %s %s' % (name, help),
+            '# TYPE %s gauge' % name,
+            '%s %s' % (name, value)]
+
+
+#----------------------------------------------------------------------------#
+# Connection pool.
+#----------------------------------------------------------------------------#
+
+
+class PoolMetrics:
+    """Checkout latency, saturation and connection churn of the db pool."""
+
+    def __init__(self):
+        self.pool = None
+        self.checkout_seconds = Histogram(
+            'fyyur_db_pool_checkout_seconds',
+            'Time spent waiting for a connection from the pool.')
+        self.checkouts = Counter(
+            'fyyur_db_pool_checkouts_total', 'Connections checked out of the pool.')
+        self.timeouts = Counter(
+            'fyyur_db_pool_timeouts_total', 'Checkouts that gave up waiting for a connection.')
+        self.connects = Counter(
+            'fyyur_db_pool_connects_total', 'New database connections opened.')
+        self.disconnects = Counter(
+            'fyyur_db_pool_disconnects_total', 'Database connections closed.')
+        self.invalidations = Counter(
+            'fyyur_db_pool_invalidations_total', 'Connections invalidated after errors or failed pre-pings.')
+
+    def render(self):
+        lines = []
+        pool = self.pool
+        if pool is not None:
+            capacity = pool.size() + max(pool._max_overflow, 0)
+            checked_out = pool.checkedout()
+            lines += _gauge('fyyur_db_pool_size', 'Configured pool size.', pool.size())
+            lines += _gauge('fyyur_db_pool_max_overflow', 'Connections allowed beyond the pool size.',
+                            pool._max_overflow)
+            lines += _gauge('fyyur_db_pool_checked_out', 'Connections currently in use.', checked_out)
+            lines += _gauge('fyyur_db_pool_checked_in', 'Idle connections in the pool.', pool.checkedin())
+            lines += _gauge('fyyur_db_pool_saturation', 'Connections in use over pool capacity.',
+                            round(checked_out / capacity, 4) if capacity else 0)
+        for metric in (self.checkout_seconds, self.checkouts, self.timeouts,
+                       self.connects, self.disconnects, self.invalidations):
+            lines += metric.render()
+        return lines
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool timing how long each checkout waits for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # the latest pool wins, dispose() recreates it
+        pool_metrics.pool = self
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.timeouts.inc()
+            raise
+        finally:
+            pool_metrics.checkout_seconds.observe(time.perf_counter() - started)
+
+
+@event.listens_for(InstrumentedQueuePool, 'checkout')
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_metrics.checkouts.inc()
+
+
+@event.listens_for(InstrumentedQueuePool, 'connect')
+def _connect(dbapi_connection, connection_record):
+    pool_metrics.connects.inc()
+
+
+@event.listens_for(InstrumentedQueuePool, 'close')
+def _close(dbapi_connection, connection_record):
+    pool_metrics.disconnects.inc()
+
+
+@event.listens_for(InstrumentedQueuePool, 'invalidate')
+def _invalidate(dbapi_connection, connection_record, exception):
+    pool_metrics.invalidations.inc()
+
+
+def pool_options(app, url, instrumented=True):
+    """Engine options only a PostgreSQL database at `url` takes.
+
+    The pool sizing and the statement timeout passed to the driver; with
+    `instrumented` the pool also reports to /metrics. Other databases get
+    none of them, SQLite keeps its own pool and its driver has no
+    `options` argument.
+    """
+    if url.get_backend_name() != 'postgresql':
+        return {}
+    config = app.config
+    options = {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'connect_args': {
+            'options': '-c statement_timeout=%d' % config.get('DB_STATEMENT_TIMEOUT', 30000),
+        },
+    }
+    if instrumented:
+        options['poolclass'] = InstrumentedQueuePool
+    return options
+
+
+def instrument_pool(app):
+    """Make Flask-SQLAlchemy build its engine with `pool_options`.
+
+    They are picked when the engine gets created (see RoutingSQLAlchemy),
+    by then the database URI is final even if it was changed after setup.
+    """
+    app.extensions['pool_options'] = pool_options
+
+
+#----------------------------------------------------------------------------#
+# Requests and templates.
+#----------------------------------------------------------------------------#
+
+
+class RequestMetrics:
+    """Throughput, latency, response size and errors per endpoint."""
+
+    # bytes, from empty redirects up to large listings
+    SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+    def __init__(self):
+        self.requests = Family(
+            Counter, 'fyyur_http_requests_total',
+            'Requests handled, by endpoint, method and status.',
+            ('endpoint', 'method', 'status'))
+        self.errors = Family(
+            Counter, 'fyyur_http_request_errors_total',
+            'Requests answered with a 5xx status.', ('endpoint',))
+        self.latency = Family(
+            Histogram, 'fyyur_http_request_duration_seconds',
+            'Time spent handling a request.', ('endpoint', 'method'))
+        self.size = Family(
+            Histogram, 'fyyur_http_response_size_bytes',
+            'Size of response bodies with a known length.', ('endpoint',),
+            buckets=self.SIZE_BUCKETS)
+        self.render_seconds = Family(
+            Histogram, 'fyyur_template_render_seconds',
+            'Time spent rendering a template.', ('template',))
+
+    def render(self):
+        lines = []
+        for family in (self.requests, self.errors, self.latency, self.size, self.render_seconds):
+            lines += family.render()
+        return lines
+
+
+request_metrics = RequestMetrics()
+
+
+class TimedTemplate(Template):
+    """Jinja template recording its render time per template name."""
+
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            request_metrics.render_seconds.labels(self.name or '<string>').observe(
+                time.perf_counter() - started)
+
+
+def instrument_app(app):
+    """Record every request of `app` and the templates it renders."""
+    app.jinja_env.template_class = TimedTemplate
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('_metrics_started', None)
+        # unmatched urls share one label instead of one per path
+        endpoint = request.endpoint or 'unmatched'
+        status = response.status_code
+
+        request_metrics.requests.labels(endpoint, request.method, str(status)).inc()
+        if status >= 500:
+            request_metrics.errors.labels(endpoint).inc()
+        if started is not None:
+            request_metrics.latency.labels(endpoint, request.method).observe(
+                time.perf_counter() - started)
+        # streamed responses have no length up front
+        if response.content_length is not None:
+            request_metrics.size.labels(endpoint).observe(response.content_length)
+        return response
+
+
+#----------------------------------------------------------------------------#
+# Exposition.
+#----------------------------------------------------------------------------#
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    return '\n'.join(pool_metrics.render() + request_metrics.render()) + '\n'
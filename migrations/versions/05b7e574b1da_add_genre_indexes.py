@@ -0,0 +1,28 @@
+"""add genre indexes
+
+Revision ID: 05b7e574b1da
+Revises: d3c474105855
+Create Date: 2026-10-18 23:31:07.904218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '05b7e574b1da'
+down_revision = 'd3c474105855'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Venue_genres', 'Venue', ['genres'], unique=False,
+                    postgresql_using='gin')
+    op.create_index('ix_Artist_genres', 'Artist', ['genres'], unique=False,
+                    postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_Artist_genres', table_name='Artist')
+    op.drop_index('ix_Venue_genres', table_name='Venue')
@@ -0,0 +1,32 @@
+"""recount upcoming shows against now()
+
+Revision ID: 2329e6c1c032
+Revises: 7c2e9b41d0f3
+Create Date: 2026-10-18 23:52:19.604417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2329e6c1c032'
+down_revision = '7c2e9b41d0f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the counters were backfilled against current_date, the boundary is
+    # now() since queries.upcoming_since changed; updated_at is left alone
+    op.execute('UPDATE "Venue" SET upcoming_shows_count = ('
+               'SELECT count(*) FROM "Show" WHERE "Show".venue_id = "Venue".id '
+               'AND "Show".start_time >= now())')
+    op.execute('UPDATE "Artist" SET upcoming_shows_count = ('
+               'SELECT count(*) FROM "Show" WHERE "Show".artist_id = "Artist".id '
+               'AND "Show".start_time >= now())')
+
+
+def downgrade():
+    # nothing to undo, the counts stay correct
+    pass
@@ -0,0 +1,26 @@
+"""add keyset pagination indexes
+
+Revision ID: 3d4f6d9358ab
+Revises: 4acdad0507b6
+Create Date: 2026-10-18 20:05:47.531962
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d4f6d9358ab'
+down_revision = '4acdad0507b6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Artist_name_id', 'Artist', ['name', 'id'], unique=False)
+    op.create_index('ix_Show_start_time_id', 'Show', ['start_time', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Show_start_time_id', table_name='Show')
+    op.drop_index('ix_Artist_name_id', table_name='Artist')
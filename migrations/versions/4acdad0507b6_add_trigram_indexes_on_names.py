@@ -0,0 +1,40 @@
+"""add trigram indexes on venue and artist names
+
+Revision ID: 4acdad0507b6
+Revises: f88ed769db6e
+Create Date: 2026-10-18 19:40:12.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4acdad0507b6'
+down_revision = 'f88ed769db6e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # pg_trgm ships with contrib but may be missing on some hosts; models.py
+    # declares these indexes, so stop here rather than leave the schema short
+    bind = op.get_bind()
+    available = bind.execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).scalar()
+    if not available:
+        raise RuntimeError('the pg_trgm extension is not available on this server, '
+                           'install postgresql-contrib and run the upgrade again')
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.create_index('ix_Venue_name_trgm', 'Venue', ['name'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_Artist_name_trgm', 'Artist', ['name'], unique=False,
+                    postgresql_using='gin',
+                    postgresql_ops={'name': 'gin_trgm_ops'})
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Artist_name_trgm"')
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_name_trgm"')
@@ -0,0 +1,38 @@
+"""updated_at with time zone
+
+Revision ID: 7c2e9b41d0f3
+Revises: e4d6a1da5ad4
+Create Date: 2026-10-18 23:41:07.512093
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9b41d0f3'
+down_revision = 'e4d6a1da5ad4'
+branch_labels = None
+depends_on = None
+
+TABLES = ['Venue', 'Artist', 'Show']
+
+
+def upgrade():
+    # now() wrote the server's local time into the zoneless columns, read
+    # the existing stamps back in that same time zone
+    for table in TABLES:
+        op.alter_column(table, 'updated_at',
+                        existing_type=sa.DateTime(),
+                        type_=sa.DateTime(timezone=True),
+                        existing_nullable=False,
+                        postgresql_using='updated_at::timestamptz')
+
+
+def downgrade():
+    for table in TABLES:
+        op.alter_column(table, 'updated_at',
+                        existing_type=sa.DateTime(timezone=True),
+                        type_=sa.DateTime(),
+                        existing_nullable=False,
+                        postgresql_using='updated_at::timestamp')
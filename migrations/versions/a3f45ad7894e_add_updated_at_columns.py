@@ -0,0 +1,28 @@
+"""add updated_at columns
+
+Revision ID: a3f45ad7894e
+Revises: b884cbd3bbe9
+Create Date: 2026-10-18 22:14:38.660152
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f45ad7894e'
+down_revision = 'b884cbd3bbe9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+    op.add_column('Artist', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+    op.add_column('Show', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False))
+
+
+def downgrade():
+    op.drop_column('Show', 'updated_at')
+    op.drop_column('Artist', 'updated_at')
+    op.drop_column('Venue', 'updated_at')
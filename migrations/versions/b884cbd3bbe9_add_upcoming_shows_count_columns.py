@@ -0,0 +1,34 @@
+"""add upcoming_shows_count columns
+
+Revision ID: b884cbd3bbe9
+Revises: bd8075561bba
+Create Date: 2026-10-18 21:02:55.270331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b884cbd3bbe9'
+down_revision = 'bd8075561bba'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('Artist', sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+
+    # backfill from the existing shows
+    op.execute('UPDATE "Venue" SET upcoming_shows_count = ('
+               'SELECT count(*) FROM "Show" WHERE "Show".venue_id = "Venue".id '
+               'AND "Show".start_time >= current_date)')
+    op.execute('UPDATE "Artist" SET upcoming_shows_count = ('
+               'SELECT count(*) FROM "Show" WHERE "Show".artist_id = "Artist".id '
+               'AND "Show".start_time >= current_date)')
+
+
+def downgrade():
+    op.drop_column('Artist', 'upcoming_shows_count')
+    op.drop_column('Venue', 'upcoming_shows_count')
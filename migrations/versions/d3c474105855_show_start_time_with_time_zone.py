@@ -0,0 +1,32 @@
+"""show start_time with time zone
+
+Revision ID: d3c474105855
+Revises: a3f45ad7894e
+Create Date: 2026-10-18 23:02:51.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3c474105855'
+down_revision = 'a3f45ad7894e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # existing times were stored without a zone, read them in the
+    # server's time zone as the app always has
+    op.alter_column('Show', 'start_time',
+                    existing_type=sa.DateTime(),
+                    type_=sa.DateTime(timezone=True),
+                    postgresql_using='start_time::timestamptz')
+
+
+def downgrade():
+    op.alter_column('Show', 'start_time',
+                    existing_type=sa.DateTime(timezone=True),
+                    type_=sa.DateTime(),
+                    postgresql_using='start_time::timestamp')
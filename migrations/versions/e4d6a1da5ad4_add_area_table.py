@@ -0,0 +1,44 @@
+"""add area table
+
+Revision ID: e4d6a1da5ad4
+Revises: 05b7e574b1da
+Create Date: 2026-10-18 23:58:40.127395
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4d6a1da5ad4'
+down_revision = '05b7e574b1da'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('Area',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('city', sa.String(length=120), nullable=False),
+    sa.Column('state', sa.String(length=120), nullable=False),
+    sa.Column('venue_count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('state', 'city', name='uq_Area_state_city')
+    )
+    # backfill from the existing venues, the views keep them current after
+    op.execute(
+        'INSERT INTO "Area" (city, state, venue_count) '
+        'SELECT city, state, count(*) FROM "Venue" '
+        'WHERE city IS NOT NULL AND state IS NOT NULL '
+        'GROUP BY city, state')
+
+    # venues of an area are paged by name, the grouping index is a prefix
+    op.drop_index('ix_Venue_state_city', table_name='Venue')
+    op.create_index('ix_Venue_state_city_name_id', 'Venue',
+                    ['state', 'city', 'name', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Venue_state_city_name_id', table_name='Venue')
+    op.create_index('ix_Venue_state_city', 'Venue', ['state', 'city'], unique=False)
+    op.drop_table('Area')
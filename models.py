@@ -1,8 +1,11 @@
 #----------------------------------------------------------------------------#
 # Imports
 #----------------------------------------------------------------------------#
+from datetime import timezone
+
 from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+from routing import RoutingSQLAlchemy
+from sqlalchemy.dialects.postgresql import ARRAY
 from flask_migrate import Migrate
 
 
@@ -12,7 +15,7 @@ from flask_migrate import Migrate
 
 app = Flask(__name__)
 
-db = SQLAlchemy()
+db = RoutingSQLAlchemy()
 
 migrate = Migrate(app, db, compare_type=True)
 
@@ -23,6 +26,15 @@ migrate = Migrate(app, db, compare_type=True)
 
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        # trigram index backing the name search, see queries.search_venues
+        db.Index('ix_Venue_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        # venues of one area in name order, see queries.area_venues
+        db.Index('ix_Venue_state_city_name_id', 'state', 'city', 'name', 'id'),
+        # genre containment/overlap filters, see queries._genre_filter
+        db.Index('ix_Venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
@@ -34,35 +46,128 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_talent = db.Column(db.Boolean, nullable=False, default=True)
-    genres = db.Column(db.ARRAY(db.String(120)))
+    genres = db.Column(ARRAY(db.String(120)))
     seeking_description = db.Column(db.String(120))
+    # maintained by the Show listeners below, see `flask counters`
+    upcoming_shows_count = db.Column(db.Integer, nullable=False,
+                                     default=0, server_default='0')
+    # drives the ETag/Last-Modified of the detail pages
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.now(),
+                           onupdate=db.func.now(), server_default=db.func.now())
     shows = db.relationship('Show', backref='Venue',
                             passive_deletes=True, lazy=True)
 
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        # trigram index backing the name search, see queries.search_artists
+        db.Index('ix_Artist_name_trgm', 'name', postgresql_using='gin',
+                 postgresql_ops={'name': 'gin_trgm_ops'}),
+        # sort key of the keyset paginated /artists listing
+        db.Index('ix_Artist_name_id', 'name', 'id'),
+        # genre containment/overlap filters, see queries._genre_filter
+        db.Index('ix_Artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.ARRAY(db.String(120)))
+    genres = db.Column(ARRAY(db.String(120)))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(120))
     seeking_venue = db.Column(db.Boolean, nullable=False, default=True)
     seeking_description = db.Column(db.String(500))
+    # maintained by the Show listeners below, see `flask counters`
+    upcoming_shows_count = db.Column(db.Integer, nullable=False,
+                                     default=0, server_default='0')
+    # drives the ETag/Last-Modified of the detail pages
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.now(),
+                           onupdate=db.func.now(), server_default=db.func.now())
     shows = db.relationship('Show', backref='Artist',
                             passive_deletes=True, lazy=True)
 
 
+class Area(db.Model):
+    # one row per (city, state) venues are in, with their precomputed
+    # number, see queries.refresh_areas
+    __tablename__ = 'Area'
+    __table_args__ = (
+        db.UniqueConstraint('state', 'city', name='uq_Area_state_city'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
+    venue_count = db.Column(db.Integer, nullable=False,
+                            default=0, server_default='0')
+
+
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        # sort key of the keyset paginated /shows listing
+        db.Index('ix_Show_start_time_id', 'start_time', 'id'),
+        # shows of one venue/artist within a start_time range
+        db.Index('ix_Show_venue_id_start_time', 'venue_id', 'start_time'),
+        db.Index('ix_Show_artist_id_start_time', 'artist_id', 'start_time'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     venue_id = db.Column(db.Integer, db.ForeignKey(
         'Venue.id', ondelete='CASCADE'), nullable=False)
     artist_id = db.Column(db.Integer, db.ForeignKey(
         'Artist.id', ondelete='CASCADE'), nullable=False)
-    start_time = db.Column(db.DateTime)
+    start_time = db.Column(db.DateTime(timezone=True))
+    updated_at = db.Column(db.DateTime(timezone=True), nullable=False, default=db.func.now(),
+                           onupdate=db.func.now(), server_default=db.func.now())
+
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+
+def upcoming_since():
+    # shows that have not started yet are upcoming; the database clock
+    # decides, so every query and the counters agree on the boundary
+    return db.func.now()
+
+
+def as_utc(value):
+    """`value` as an aware UTC datetime, naive ones are taken as UTC.
+
+    Every path storing show times (the forms, imports, COPY, the API)
+    goes through it, so the same naive time is the same instant whether
+    or not the host, or the database session, runs in another zone.
+    """
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def _adjust_upcoming_counts(connection, show, delta):
+    if show.start_time is None:
+        return
+    start_time = db.literal(show.start_time, Show.start_time.type)
+    for model, entity_id in ((Venue, show.venue_id), (Artist, show.artist_id)):
+        table = model.__table__
+        # a counter only update: setting updated_at to itself keeps its
+        # onupdate from firing, the show's own stamp versions the page
+        connection.execute(
+            table.update().
+            where(table.c.id == entity_id, start_time >= upcoming_since()).
+            values(upcoming_shows_count=table.c.upcoming_shows_count + delta,
+                   updated_at=table.c.updated_at))
+
+
+@db.event.listens_for(Show, 'after_insert')
+def count_inserted_show(mapper, connection, show):
+    _adjust_upcoming_counts(connection, show, 1)
+
+
+@db.event.listens_for(Show, 'after_delete')
+def count_deleted_show(mapper, connection, show):
+    _adjust_upcoming_counts(connection, show, -1)
@@ -0,0 +1,122 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import json
+import random
+import time
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+#----------------------------------------------------------------------------#
+# Per-request query profiler.
+#----------------------------------------------------------------------------#
+
+
+class QueryStats:
+    __slots__ = ('count', 'seconds', 'slowest', 'slowest_statement')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+
+
+class QueryProfiler:
+    """Counts the SQL statements and database time of each request.
+
+    Every statement is timed through the cursor execute events, and any
+    statement slower than SLOW_QUERY_THRESHOLD_MS is logged in full with
+    its parameters, CLI commands included. Only a sampled fraction of
+    requests (QUERY_PROFILER_SAMPLE_RATE) adds up its statements for a
+    Server-Timing header and a JSON log line.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        if not app.config.get('QUERY_PROFILER_ENABLED', True):
+            return
+
+        self.sample_rate = app.config.get('QUERY_PROFILER_SAMPLE_RATE', 0.01)
+        self.threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', 200) / 1000.0
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        # every engine, so binds and replicas are covered too
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        event.listen(Engine, 'handle_error', self._execute_failed)
+
+    @staticmethod
+    def stats():
+        """QueryStats of the current request, None when it is not sampled."""
+        if not has_request_context():
+            return None
+        return g.get('_query_stats')
+
+    def _start(self):
+        if self.sample_rate >= 1 or random.random() < self.sample_rate:
+            g._query_stats = QueryStats()
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not conn.info.get('_query_started'):
+            return
+        elapsed = time.perf_counter() - conn.info['_query_started'].pop()
+
+        stats = self.stats()
+        if stats is not None:
+            stats.count += 1
+            stats.seconds += elapsed
+            if elapsed > stats.slowest:
+                stats.slowest = elapsed
+                stats.slowest_statement = statement
+
+        if elapsed >= self.threshold:
+            self.app.logger.warning(json.dumps({
+                "event": "slow_query",
+                "path": request.path if has_request_context() else None,
+                "duration_ms": round(elapsed * 1000, 2),
+                "statement": statement,
+                "parameters": repr(parameters),
+            }))
+
+    def _execute_failed(self, context):
+        # a failed statement never reaches after_cursor_execute, drop its
+        # start time or the connection's list grows with every error
+        conn = context.connection
+        if conn is not None and conn.info.get('_query_started'):
+            conn.info['_query_started'].pop()
+
+    def _finish(self, response):
+        stats = self.stats()
+        if stats is None:
+            return response
+
+        response.headers.add(
+            'Server-Timing', 'db;dur=%.2f;desc="%d queries"' % (stats.seconds * 1000, stats.count))
+        if stats.count:
+            response.headers.add('Server-Timing', 'db-slowest;dur=%.2f' % (stats.slowest * 1000))
+
+        self.app.logger.info(json.dumps({
+            "event": "request_queries",
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+            "queries": stats.count,
+            "db_ms": round(stats.seconds * 1000, 2),
+            "slowest_ms": round(stats.slowest * 1000, 2),
+            "slowest_statement": stats.slowest_statement,
+        }))
+        return response
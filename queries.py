@@ -0,0 +1,667 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import base64
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Venue, Artist, Area, Show, upcoming_since
+
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#----------------------------------------------------------------------------#
+
+
+def _encode_cursor(values):
+    # opaque, url safe cursor holding the sort key of a row
+    values = [value.isoformat() if isinstance(value, datetime) else value
+              for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor, types):
+    # a missing or malformed cursor starts from the first page
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # one value per sort key, zip would quietly drop the missing ones;
+        # the sort keys are never null
+        if not isinstance(values, list) or len(values) != len(types) or None in values:
+            return None
+        return tuple(datetime.fromisoformat(value) if kind is datetime else kind(value)
+                     for kind, value in zip(types, values))
+    except (ValueError, TypeError):
+        return None
+
+
+def _page_size(limit):
+    default = current_app.config.get('PAGE_SIZE', 50)
+    maximum = current_app.config.get('MAX_PAGE_SIZE', 200)
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def _keyset_page(query, keys, after=None, before=None, limit=None):
+    """One page of `query` ordered by the `keys` columns.
+
+    Pages are found by comparing the sort key against the cursor instead
+    of using OFFSET, so every page costs the same index range scan no
+    matter how deep it is. Returns the rows plus next/prev cursors.
+    """
+    names = [key.key for key in keys]
+    types = [key.type.python_type for key in keys]
+    limit = _page_size(limit)
+    after = _decode_cursor(after, types)
+    before = _decode_cursor(before, types)
+
+    if before is not None:
+        # walk backwards from the cursor and flip the page afterwards
+        query = query.filter(db.tuple_(*keys) < before).\
+            order_by(*[key.desc() for key in keys])
+    else:
+        if after is not None:
+            query = query.filter(db.tuple_(*keys) > after)
+        query = query.order_by(*keys)
+
+    # one extra row tells whether there is another page in this direction
+    rows = _rows(query.limit(limit + 1))
+    more = len(rows) > limit
+    rows = rows[:limit]
+    if before is not None:
+        rows.reverse()
+        has_prev, has_next = more, True
+    else:
+        has_prev, has_next = after is not None, more
+
+    def cursor(row):
+        return _encode_cursor([getattr(row, name) for name in names])
+
+    return {"items": rows,
+            "limit": limit,
+            "prev": cursor(rows[0]) if rows and has_prev else None,
+            "next": cursor(rows[-1]) if rows and has_next else None}
+
+
+#----------------------------------------------------------------------------#
+# Fields.
+#----------------------------------------------------------------------------#
+
+# public field name -> column, shared by the pages and the JSON API whose
+# `fields=` parameter picks which of them get selected
+VENUE_FIELDS = {
+    "id": Venue.id,
+    "name": Venue.name,
+    "genres": Venue.genres,
+    "address": Venue.address,
+    "city": Venue.city,
+    "state": Venue.state,
+    "phone": Venue.phone,
+    "website": Venue.website_link,
+    "facebook_link": Venue.facebook_link,
+    "seeking_talent": Venue.seeking_talent,
+    "seeking_description": Venue.seeking_description,
+    "image_link": Venue.image_link,
+    "num_upcoming_shows": Venue.upcoming_shows_count,
+}
+
+ARTIST_FIELDS = {
+    "id": Artist.id,
+    "name": Artist.name,
+    "genres": Artist.genres,
+    "city": Artist.city,
+    "state": Artist.state,
+    "phone": Artist.phone,
+    "seeking_venue": Artist.seeking_venue,
+    "seeking_description": Artist.seeking_description,
+    "facebook_link": Artist.facebook_link,
+    "website": Artist.website_link,
+    "image_link": Artist.image_link,
+    "num_upcoming_shows": Artist.upcoming_shows_count,
+}
+
+SHOW_FIELDS = {
+    "venue_id": Show.venue_id,
+    "venue_name": Venue.name,
+    "artist_id": Show.artist_id,
+    "artist_name": Artist.name,
+    "artist_image_link": Artist.image_link,
+    "start_time": Show.start_time,
+    # the show tiles' fragment cache keys, they change with any write to
+    # the venue or artist whichever worker or command made it
+    "venue_updated_at": Venue.updated_at,
+    "artist_updated_at": Artist.updated_at,
+}
+
+# fields of the detail pages computed from the entity's shows
+SHOW_LIST_FIELDS = ["past_shows", "upcoming_shows",
+                    "past_shows_count", "upcoming_shows_count"]
+
+
+class FieldError(ValueError):
+    """Raised when a caller asks for a field that does not exist."""
+
+
+def _fields(available, fields, default):
+    """Validated list of requested field names, `default` when None."""
+    if fields is None:
+        return list(default)
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise FieldError('unknown fields: %s' % ', '.join(unknown))
+    # repeated names are selected once
+    return list(dict.fromkeys(fields))
+
+
+def _labeled(mapping, fields):
+    return [mapping[field].label(field) for field in fields]
+
+
+def _rows(query):
+    # list paths run the query's Core statement: plain rows, without the
+    # ORM loading layer a Query result goes through
+    return db.session.execute(query.statement).all()
+
+
+def _items(rows, fields):
+    # `fields` are the leading columns of each row, in order; anything
+    # selected after them (sort keys, grouping) is left out
+    return [dict(zip(fields, row)) for row in rows]
+
+
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+
+def _genre_filter(query, model, genres, match='all'):
+    # 'all' keeps rows having every genre (@>), 'any' rows having at least
+    # one of them (&&); both are answered from the GIN index on genres
+    if not genres:
+        return query
+    if match == 'any':
+        return query.filter(model.genres.overlap(list(genres)))
+    return query.filter(model.genres.contains(list(genres)))
+
+
+def _genre_counts(model, genres, match):
+    # unnest the genres of the matching rows and count them in one
+    # aggregate, most common first
+    genre = db.func.unnest(model.genres).label('genre')
+    unnested = _genre_filter(db.session.query(genre), model, genres, match).subquery()
+    count = db.func.count().label('count')
+    rows = db.session.query(unnested.c.genre, count).\
+        group_by(unnested.c.genre).\
+        order_by(count.desc(), unnested.c.genre).all()
+    return [{"genre": row.genre, "count": row.count} for row in rows]
+
+
+def venue_genre_counts(genres=None, match='all'):
+    """[{genre, count}] over the venues matching `genres`, see `_genre_filter`."""
+    return _genre_counts(Venue, genres, match)
+
+
+def artist_genre_counts(genres=None, match='all'):
+    """[{genre, count}] over the artists matching `genres`, see `_genre_filter`."""
+    return _genre_counts(Artist, genres, match)
+
+
+#----------------------------------------------------------------------------#
+# Venues.
+#----------------------------------------------------------------------------#
+
+
+def _detail(model, available, show_fk, related, related_fk, describe, entity_id, fields):
+    # the entity and, when asked for, its shows with their related
+    # venue/artist in one statement; a CASE on the database clock marks
+    # each show past or upcoming
+    fields = _fields(list(available) + SHOW_LIST_FIELDS, fields,
+                     list(available) + SHOW_LIST_FIELDS)
+    entity_fields = [field for field in fields if field in available]
+    with_shows = any(field in SHOW_LIST_FIELDS for field in fields)
+
+    query = db.session.query(model.id.label('entity_id'),
+                             *_labeled(available, entity_fields)).\
+        filter(model.id == entity_id)
+    if with_shows:
+        now = upcoming_since()
+        query = query.add_columns(
+            *_labeled(describe, describe),
+            db.case((Show.start_time >= now, 'upcoming'),
+                    (Show.start_time < now, 'past')).label('show_state')).\
+            outerjoin(Show, show_fk == model.id).\
+            outerjoin(related, related_fk == related.id).\
+            order_by(Show.start_time, Show.id)
+
+    # one row per show, the entity's columns repeat on each of them
+    rows = query.all()
+    if not rows:
+        return None
+
+    data = {field: getattr(rows[0], field) for field in entity_fields}
+
+    if with_shows:
+        # shows without a start time are neither past nor upcoming
+        shows = {"past": [], "upcoming": []}
+        for row in rows:
+            if row.show_state is not None:
+                shows[row.show_state].append({name: getattr(row, name) for name in describe})
+        shows = {"past_shows": shows["past"],
+                 "upcoming_shows": shows["upcoming"],
+                 "past_shows_count": len(shows["past"]),
+                 "upcoming_shows_count": len(shows["upcoming"])}
+        data.update((field, shows[field]) for field in fields if field in shows)
+
+    return data
+
+
+def venue_detail(venue_id, fields=None):
+    """Venue page data with its past and upcoming shows, or None.
+
+    The venue and its shows (with their artists) come from a single
+    statement. `fields` limits the data to VENUE_FIELDS/SHOW_LIST_FIELDS.
+    """
+    return _detail(Venue, VENUE_FIELDS, Show.venue_id, Artist, Show.artist_id,
+                   {"artist_id": Artist.id,
+                    "artist_name": Artist.name,
+                    "artist_image_link": Artist.image_link,
+                    "artist_updated_at": Artist.updated_at,
+                    "start_time": Show.start_time},
+                   venue_id, fields)
+
+
+#----------------------------------------------------------------------------#
+# Areas.
+#----------------------------------------------------------------------------#
+
+
+def area_index(genres=None, match='all'):
+    """Areas having venues, by state and city, with their number of venues.
+
+    Reads the precomputed counts; with `genres` the matching venues are
+    counted per area instead, see `_genre_filter`.
+    """
+    if not genres:
+        query = db.session.query(Area.id, Area.city, Area.state, Area.venue_count).\
+            filter(Area.venue_count > 0)
+    else:
+        venue_count = db.func.count(Venue.id).label('venue_count')
+        query = db.session.query(Area.id, Area.city, Area.state, venue_count).\
+            join(Venue, db.and_(Venue.city == Area.city, Venue.state == Area.state))
+        query = _genre_filter(query, Venue, genres, match).\
+            group_by(Area.id, Area.city, Area.state)
+
+    return _items(_rows(query.order_by(Area.state, Area.city)),
+                  ["id", "city", "state", "venue_count"])
+
+
+def area_venues(area_id, after=None, before=None, limit=None, fields=None,
+                genres=None, match='all'):
+    """A page of the area's venues ordered by name, or None without the area.
+
+    The page (see `_keyset_page`) carries the area under "area".
+    """
+    area = db.session.query(Area.id, Area.city, Area.state, Area.venue_count).\
+        filter(Area.id == area_id).one_or_none()
+    if area is None:
+        return None
+
+    fields = _fields(VENUE_FIELDS, fields, ["id", "name", "num_upcoming_shows"])
+
+    # the sort key is always selected after the fields, it makes up the cursors
+    columns = {field: VENUE_FIELDS[field] for field in fields}
+    columns.setdefault("name", Venue.name)
+    columns.setdefault("id", Venue.id)
+
+    # answered in order from the (state, city, name, id) index
+    query = db.session.query(*_labeled(columns, columns)).\
+        filter(Venue.state == area.state, Venue.city == area.city,
+               Venue.name.isnot(None))
+    query = _genre_filter(query, Venue, genres, match)
+
+    page = _keyset_page(query, [Venue.name, Venue.id], after, before, limit)
+    page["items"] = _items(page["items"], fields)
+    page["area"] = {"id": area.id, "city": area.city, "state": area.state,
+                    "venue_count": area.venue_count}
+    return page
+
+
+# both spell the upsert the same way
+_UPSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+
+def count_area_venues(changes):
+    """Add {(city, state): venues added or removed} to the areas' counts.
+
+    A single INSERT ... ON CONFLICT DO UPDATE adds each change to the
+    stored count, creating missing areas, so venues written concurrently
+    neither collide on a new area nor overwrite each other's counts. Rows
+    go in (state, city) order, keeping concurrent upserts from
+    deadlocking. The caller commits.
+    """
+    values = [{"state": state, "city": city, "venue_count": change}
+              for (city, state), change in changes.items()
+              if city is not None and state is not None and change]
+    if not values:
+        return
+    insert = _UPSERTS[db.session.get_bind().dialect.name](Area).\
+        values(sorted(values, key=lambda value: (value["state"], value["city"])))
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=[Area.state, Area.city],
+        set_={"venue_count": Area.venue_count + insert.excluded.venue_count}))
+
+
+def refresh_areas(areas=None):
+    """Recompute the venue counts of the given (city, state) areas.
+
+    Missing areas are added. Areas left without venues keep their row
+    (and id) with a count of 0, the index skips them. None refreshes
+    every area. A recount races with concurrent venue writes, those use
+    `count_area_venues`; this is for `flask areas refresh` and bulk loads.
+    The caller commits.
+    """
+    counts = db.session.query(Venue.city, Venue.state, db.func.count(Venue.id)).\
+        filter(Venue.city.isnot(None), Venue.state.isnot(None)).\
+        group_by(Venue.city, Venue.state)
+    existing = db.session.query(Area)
+    if areas is not None:
+        areas = [(city, state) for city, state in set(areas)
+                 if city is not None and state is not None]
+        if not areas:
+            return
+        counts = counts.filter(db.tuple_(Venue.city, Venue.state).in_(areas))
+        existing = existing.filter(db.tuple_(Area.city, Area.state).in_(areas))
+
+    counts = {(city, state): count for city, state, count in counts}
+    for area in existing:
+        area.venue_count = counts.pop((area.city, area.state), 0)
+    for (city, state), count in counts.items():
+        db.session.add(Area(city=city, state=state, venue_count=count))
+
+
+#----------------------------------------------------------------------------#
+# Artists.
+#----------------------------------------------------------------------------#
+
+
+def artists_page(after=None, before=None, limit=None, fields=None, genres=None, match='all'):
+    """A page of artists ordered by name, see `_keyset_page`.
+
+    `genres` keeps only the artists playing them, see `_genre_filter`.
+    """
+    fields = _fields(ARTIST_FIELDS, fields, ["id", "name"])
+
+    # the sort key is always selected after the fields, it makes up the cursors
+    columns = {field: ARTIST_FIELDS[field] for field in fields}
+    columns.setdefault("name", Artist.name)
+    columns.setdefault("id", Artist.id)
+
+    # artists without a name cannot be placed on a name cursor
+    query = db.session.query(*_labeled(columns, columns)).\
+        filter(Artist.name.isnot(None))
+    query = _genre_filter(query, Artist, genres, match)
+
+    page = _keyset_page(query, [Artist.name, Artist.id], after, before, limit)
+    page["items"] = _items(page["items"], fields)
+    return page
+
+
+def artist_detail(artist_id, fields=None):
+    """Artist page data with its past and upcoming shows, or None."""
+    return _detail(Artist, ARTIST_FIELDS, Show.artist_id, Venue, Show.venue_id,
+                   {"venue_id": Venue.id,
+                    "venue_name": Venue.name,
+                    "venue_image_link": Venue.image_link,
+                    "venue_updated_at": Venue.updated_at,
+                    "start_time": Show.start_time},
+                   artist_id, fields)
+
+
+#----------------------------------------------------------------------------#
+# Shows.
+#----------------------------------------------------------------------------#
+
+
+def shows_page(after=None, before=None, limit=None, fields=None):
+    """A page of shows ordered by start time, see `_keyset_page`."""
+    fields = _fields(SHOW_FIELDS, fields, SHOW_FIELDS)
+
+    # the sort key is always selected after the fields, it makes up the cursors
+    columns = {field: SHOW_FIELDS[field] for field in fields}
+    columns.setdefault("start_time", Show.start_time)
+    columns.setdefault("id", Show.id)
+
+    # only the requested columns, joined in the same statement
+    query = db.session.query(*_labeled(columns, columns)).\
+        select_from(Show).\
+        filter(Show.start_time.isnot(None))
+    joined = {columns[field].class_ for field in fields}
+    if Venue in joined:
+        query = query.join(Venue, Show.venue_id == Venue.id)
+    if Artist in joined:
+        query = query.join(Artist, Show.artist_id == Artist.id)
+
+    page = _keyset_page(query, [Show.start_time, Show.id], after, before, limit)
+    page["items"] = _items(page["items"], fields)
+    return page
+
+
+#----------------------------------------------------------------------------#
+# Search.
+#----------------------------------------------------------------------------#
+
+
+# engine -> whether pg_trgm is installed, looked up once per engine
+_trigram_available = {}
+
+
+def search_backend():
+    """Name of the search backend in use, either 'trigram' or 'ilike'."""
+    backend = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if backend != 'auto':
+        return backend
+
+    engine = db.get_engine()
+    if engine not in _trigram_available:
+        available = False
+        if engine.dialect.name == 'postgresql':
+            available = db.session.execute(db.text(
+                "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar() is not None
+        _trigram_available[engine] = available
+
+    return 'trigram' if _trigram_available[engine] else 'ilike'
+
+
+def _search(model, available, search_term, backend=None, fields=None, genres=None, match='all'):
+    # one query returning every match with its precomputed upcoming show count
+    backend = backend or search_backend()
+    fields = _fields(available, fields, ["id", "name", "num_upcoming_shows"])
+
+    query = db.session.query(*_labeled(available, fields)).\
+        filter(model.name.ilike('%' + search_term + '%'))
+    query = _genre_filter(query, model, genres, match)
+
+    if backend == 'trigram':
+        # the ILIKE above is answered from the gin_trgm_ops index,
+        # closest names first
+        query = query.order_by(
+            db.func.similarity(model.name, search_term).desc(), model.name, model.id)
+    else:
+        query = query.order_by(model.name, model.id)
+
+    data = _items(_rows(query), fields)
+
+    # the count comes from the same result set, no extra COUNT query
+    return {"count": len(data), "data": data}
+
+
+def search_venues(search_term, backend=None, fields=None, genres=None, match='all'):
+    """Venues whose name contains `search_term`, case-insensitively."""
+    return _search(Venue, VENUE_FIELDS, search_term, backend, fields, genres, match)
+
+
+def search_artists(search_term, backend=None, fields=None, genres=None, match='all'):
+    """Artists whose name contains `search_term`, case-insensitively."""
+    return _search(Artist, ARTIST_FIELDS, search_term, backend, fields, genres, match)
+
+
+#----------------------------------------------------------------------------#
+# Detail page versions.
+#----------------------------------------------------------------------------#
+
+
+def _version(model, show_fk, related, related_fk, entity_id):
+    # one aggregate over the entity, its shows and the venues/artists
+    # those shows name; the show count catches deleted shows and the
+    # started ones move from upcoming to past, which changes the page too
+    started = Show.start_time < upcoming_since()
+    row = db.session.query(
+        model.updated_at,
+        db.func.max(Show.updated_at),
+        db.func.count(Show.id),
+        db.func.max(related.updated_at),
+        db.func.count(db.case((started, Show.id))),
+        db.func.max(db.case((started, Show.start_time)))).\
+        outerjoin(Show, show_fk == model.id).\
+        outerjoin(related, related_fk == related.id).\
+        filter(model.id == entity_id).\
+        group_by(model.id, model.updated_at).one_or_none()
+    if row is None:
+        return None
+
+    stamps = [stamp for stamp in (row[0], row[1], row[3], row[5]) if stamp is not None]
+    # every stamp is timezone aware on PostgreSQL, naive ones (SQLite)
+    # are already UTC
+    stamps = [stamp.astimezone(timezone.utc).replace(tzinfo=None) if stamp.tzinfo else stamp
+              for stamp in stamps]
+    last_modified = max(stamps).replace(microsecond=0)
+    etag = hashlib.sha1(repr((model.__tablename__, entity_id, tuple(row))).
+                        encode('utf-8')).hexdigest()
+    return etag, last_modified
+
+
+def venue_version(venue_id):
+    """(ETag, Last-Modified) of the venue page, or None if there is no venue."""
+    return _version(Venue, Show.venue_id, Artist, Show.artist_id, venue_id)
+
+
+def artist_version(artist_id):
+    """(ETag, Last-Modified) of the artist page, or None if there is no artist."""
+    return _version(Artist, Show.artist_id, Venue, Show.venue_id, artist_id)
+
+
+#----------------------------------------------------------------------------#
+# Scheduling.
+#----------------------------------------------------------------------------#
+
+
+def missing_references(venue_ids, artist_ids):
+    """(venue ids, artist ids) among the given ones that do not exist.
+
+    Both tables are checked in a single UNION ALL query.
+    """
+    venue_ids, artist_ids = set(venue_ids), set(artist_ids)
+    found = db.session.query(db.literal('venue').label('kind'), Venue.id).\
+        filter(Venue.id.in_(venue_ids)).\
+        union_all(db.session.query(db.literal('artist'), Artist.id).
+                  filter(Artist.id.in_(artist_ids))).all()
+    for kind, entity_id in found:
+        (venue_ids if kind == 'venue' else artist_ids).discard(entity_id)
+    return venue_ids, artist_ids
+
+
+def booked_shows(venue_ids, artist_ids, start, end):
+    """Shows of the venues or artists starting in [start, end).
+
+    One query, a range scan on each of the (venue_id, start_time) and
+    (artist_id, start_time) indexes.
+    """
+    return db.session.query(Show.id, Show.venue_id, Show.artist_id, Show.start_time).\
+        filter(db.or_(Show.venue_id.in_(venue_ids), Show.artist_id.in_(artist_ids)),
+               Show.start_time >= start, Show.start_time < end).all()
+
+
+#----------------------------------------------------------------------------#
+# Cache invalidation.
+#----------------------------------------------------------------------------#
+
+
+def venue_artist_ids(venue_id):
+    """Ids of the artists with a show at the venue."""
+    rows = db.session.query(Show.artist_id).\
+        filter(Show.venue_id == venue_id).distinct().all()
+    return [row.artist_id for row in rows]
+
+
+def artist_venue_ids(artist_id):
+    """Ids of the venues the artist has a show at."""
+    rows = db.session.query(Show.venue_id).\
+        filter(Show.artist_id == artist_id).distinct().all()
+    return [row.venue_id for row in rows]
+
+
+#----------------------------------------------------------------------------#
+# Upcoming show counters.
+#----------------------------------------------------------------------------#
+
+
+def _upcoming_count(model, show_fk):
+    # correlated count of the entity's upcoming shows
+    return db.select(db.func.count(Show.id)).\
+        where(show_fk == model.id, Show.start_time >= upcoming_since()).\
+        scalar_subquery()
+
+
+def refresh_upcoming_counts(venue_ids=None, artist_ids=None):
+    """Recompute the stored upcoming show counts from the Show table.
+
+    Only the given venues/artists are refreshed; None refreshes all of
+    them and an empty list none. The caller commits.
+    """
+    for model, show_fk, ids in ((Venue, Show.venue_id, venue_ids),
+                                (Artist, Show.artist_id, artist_ids)):
+        if ids is not None and not ids:
+            continue
+        query = db.session.query(model)
+        if ids is not None:
+            query = query.filter(model.id.in_(ids))
+        # updated_at is kept as is: the counts alone change no page's
+        # version, whose started show count already moves with them
+        query.update({model.upcoming_shows_count: _upcoming_count(model, show_fk),
+                      model.updated_at: model.updated_at},
+                     synchronize_session=False)
+
+
+def roll_upcoming_counts(since):
+    """Refresh the counts touched by shows that became past since `since`.
+
+    Returns the number of venues and artists refreshed.
+    """
+    passed = db.session.query(Show.venue_id, Show.artist_id).\
+        filter(Show.start_time >= since, Show.start_time < upcoming_since()).all()
+    venue_ids = sorted({show.venue_id for show in passed})
+    artist_ids = sorted({show.artist_id for show in passed})
+
+    refresh_upcoming_counts(venue_ids, artist_ids)
+    return len(venue_ids), len(artist_ids)
+
+
+def upcoming_counts_drift():
+    """(kind, id, stored, actual) for every counter that is out of date."""
+    drift = []
+    for kind, model, show_fk in (('venue', Venue, Show.venue_id),
+                                 ('artist', Artist, Show.artist_id)):
+        actual = _upcoming_count(model, show_fk)
+        rows = db.session.query(model.id, model.upcoming_shows_count,
+                                actual.label('actual')).\
+            filter(model.upcoming_shows_count != actual).\
+            order_by(model.id).all()
+        drift.extend((kind, row.id, row.upcoming_shows_count, row.actual)
+                     for row in rows)
+    return drift
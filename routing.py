@@ -0,0 +1,181 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import threading
+import time
+
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import create_engine, event, exc, orm
+from sqlalchemy.engine import make_url
+
+
+#----------------------------------------------------------------------------#
+# Read replica routing.
+#
+# Requests with a safe method (GET, HEAD, OPTIONS) read from one of the
+# SQLALCHEMY_REPLICA_URIS, picked round-robin per request; everything else,
+# flushes and any request of a client that wrote in the last
+# READ_YOUR_WRITES_SECONDS use the primary. A replica failing to connect is
+# ejected for REPLICA_EJECT_SECONDS and the read retried on the next one;
+# while every replica is out, reads fall back to the primary. The writer's
+# marker lives in the signed session cookie, so every worker has to share
+# SECRET_KEY (config.py refuses replicas without one).
+#
+# Pages read by those sticky clients, or from a replica within
+# READ_YOUR_WRITES_SECONDS of a write, may lag behind it: they set
+# g.skip_response_cache so cache.py neither serves nor stores them.
+#----------------------------------------------------------------------------#
+
+SAFE_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS'])
+
+
+class RoutingSession(SignallingSession):
+    """Session reading from a replica when the current request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router = self.app.extensions.get('replica_router')
+        if router is not None and not self._flushing:
+            engine = router.read_engine()
+            if engine is not None:
+                return engine
+        return SignallingSession.get_bind(self, mapper, clause)
+
+    def _connection_for_bind(self, engine, execution_options=None, **kwargs):
+        router = self.app.extensions.get('replica_router')
+        while True:
+            try:
+                return SignallingSession._connection_for_bind(
+                    self, engine, execution_options, **kwargs)
+            except exc.DBAPIError:
+                # the replica could not be reached and got ejected, nothing
+                # was read yet: retry on the next one or the primary
+                if router is None or not router.ejected(engine):
+                    raise
+                engine = router.fail_over() or SignallingSession.get_bind(self)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, sa_url, options):
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        # backend specific pool and driver options, see metrics.instrument_pool
+        pool_options = app.extensions.get('pool_options')
+        if pool_options is not None:
+            options.update(pool_options(app, sa_url))
+        return sa_url, options
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(db_session):
+    router = db_session.app.extensions.get('replica_router')
+    if router is not None:
+        router.wrote_at = time.monotonic()
+    if has_request_context():
+        g._db_wrote = True
+
+
+class _Replica:
+    def __init__(self, url, engine):
+        self.url = url
+        self.engine = engine
+        self.ejected_until = 0.0
+
+
+class ReplicaRouter:
+    def __init__(self, app=None):
+        self.replicas = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.eject_seconds = app.config.get('REPLICA_EJECT_SECONDS', 30)
+        self.sticky_seconds = app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+        self.replicas = [self._replica(app, uri)
+                         for uri in app.config.get('SQLALCHEMY_REPLICA_URIS', [])]
+        self._next = 0
+        self._lock = threading.Lock()
+        # last commit of this worker, replicas may not have it yet
+        self.wrote_at = 0.0
+
+        app.before_request(self._skip_cache_when_sticky)
+        app.after_request(self._stick_after_write)
+        app.extensions['replica_router'] = self
+
+    def _replica(self, app, uri):
+        url = make_url(uri)
+        options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        pool_options = app.extensions.get('pool_options')
+        if pool_options is not None:
+            # a plain pool of their own, the instrumented one reports on
+            # the primary
+            options.update(pool_options(app, url, instrumented=False))
+        replica = _Replica(uri, create_engine(url, **options))
+
+        @event.listens_for(replica.engine, 'handle_error')
+        def eject(context):
+            # only failures to reach the replica, not bad statements
+            if context.is_disconnect or context.connection is None:
+                replica.ejected_until = time.monotonic() + self.eject_seconds
+                app.logger.warning('replica %s ejected for %ds: %s', url.render_as_string(),
+                                   self.eject_seconds, context.original_exception)
+
+        return replica
+
+    def pick(self):
+        """Next healthy replica engine round-robin, None when all are out."""
+        now = time.monotonic()
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = self.replicas[self._next % len(self.replicas)]
+                self._next += 1
+                if replica.ejected_until <= now:
+                    return replica.engine
+        return None
+
+    def ejected(self, engine):
+        """Whether `engine` is a replica currently left out."""
+        now = time.monotonic()
+        return any(replica.engine is engine and replica.ejected_until > now
+                   for replica in self.replicas)
+
+    def fail_over(self):
+        """Replace the request's failed replica, None for the primary."""
+        g._db_replica = self._read_replica()
+        return g._db_replica
+
+    def read_engine(self):
+        """Replica engine of the current request, None for the primary."""
+        if not self.replicas or not has_request_context():
+            return None
+        if '_db_replica' not in g:
+            # chosen once, so a request reads from a single replica
+            g._db_replica = None if request.method not in SAFE_METHODS or self._sticky() \
+                else self._read_replica()
+        return g._db_replica
+
+    def _read_replica(self):
+        engine = self.pick()
+        if engine is not None and time.monotonic() - self.wrote_at < self.sticky_seconds:
+            # the replica may not have the write yet, keep the page out of
+            # the caches or it would outlive the lag
+            g.skip_response_cache = True
+        return engine
+
+    def _sticky(self):
+        return session.get('_primary_until', 0) > time.time()
+
+    def _skip_cache_when_sticky(self):
+        # cached pages may predate the client's own write, render them
+        # fresh from the primary
+        if self.replicas and self._sticky():
+            g.skip_response_cache = True
+
+    def _stick_after_write(self, response):
+        # the writer's next reads see its own writes despite replica lag
+        if g.get('_db_wrote') and self.sticky_seconds:
+            session['_primary_until'] = time.time() + self.sticky_seconds
+        return response
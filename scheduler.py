@@ -0,0 +1,119 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import bisect
+from collections import defaultdict
+from datetime import timedelta
+
+from flask import current_app
+
+from models import db, Show, as_utc
+import queries
+
+
+#----------------------------------------------------------------------------#
+# Batch show scheduling.
+#
+# Shows have no end time, each one is taken to occupy its venue and its
+# artist for SHOW_DURATION_HOURS from its start. Two shows of the same
+# venue, or of the same artist, conflict when they start closer together
+# than that.
+#----------------------------------------------------------------------------#
+
+
+def show_duration():
+    """How long a show keeps its venue and artist busy."""
+    return timedelta(hours=current_app.config.get('SHOW_DURATION_HOURS', 3))
+
+
+class _Bookings:
+    """Sorted start times per venue and per artist, queried with bisect."""
+
+    def __init__(self, duration):
+        self.duration = duration
+        self.starts = defaultdict(list)
+
+    def add(self, venue_id, artist_id, start):
+        bisect.insort(self.starts['venue', venue_id], start)
+        bisect.insort(self.starts['artist', artist_id], start)
+
+    def _overlaps(self, key, start):
+        starts = self.starts.get(key)
+        if not starts:
+            return False
+        # the nearest booking on either side is the only one to check
+        index = bisect.bisect_left(starts, start)
+        return (index < len(starts) and starts[index] - start < self.duration) or \
+            (index > 0 and start - starts[index - 1] < self.duration)
+
+    def conflict(self, venue_id, artist_id, start):
+        if self._overlaps(('venue', venue_id), start):
+            return 'venue %d is booked within %s of %s' % (venue_id, self.duration, start)
+        if self._overlaps(('artist', artist_id), start):
+            return 'artist %d is booked within %s of %s' % (artist_id, self.duration, start)
+        return None
+
+
+def schedule_shows(rows, duration, strict=False):
+    """Insert the shows of `rows` that neither conflict nor dangle.
+
+    `rows` are (reference, {venue_id, artist_id, start_time}) pairs, the
+    reference (a line number, a list index) is only used to report back.
+    Shows pointing at missing venues/artists, or overlapping a booked show
+    or an earlier show of the batch, are rejected; with `strict` any
+    rejection rejects the whole batch.
+
+    Returns (scheduled rows, [(reference, error)]). On PostgreSQL the Show
+    table is locked against concurrent writers until the caller commits.
+    """
+    rows = [(reference, row) for reference, row in rows]
+    rejected = []
+    if not rows:
+        return [], rejected
+
+    missing_venues, missing_artists = queries.missing_references(
+        [row['venue_id'] for _, row in rows], [row['artist_id'] for _, row in rows])
+    candidates = []
+    for reference, row in rows:
+        if row['venue_id'] in missing_venues:
+            rejected.append((reference, 'venue %d does not exist' % row['venue_id']))
+        elif row['artist_id'] in missing_artists:
+            rejected.append((reference, 'artist %d does not exist' % row['artist_id']))
+        else:
+            candidates.append((reference, row))
+    if not candidates:
+        return [], rejected
+
+    if db.session.connection().dialect.name == 'postgresql':
+        # readers go on, other schedulers and show writers wait for the commit
+        db.session.execute(db.text('LOCK TABLE "Show" IN SHARE ROW EXCLUSIVE MODE'))
+
+    # everything already booked within reach of the batch, in one query
+    starts = [as_utc(row['start_time']) for _, row in candidates]
+    bookings = _Bookings(duration)
+    for show in queries.booked_shows({row['venue_id'] for _, row in candidates},
+                                     {row['artist_id'] for _, row in candidates},
+                                     min(starts) - duration, max(starts) + duration):
+        bookings.add(show.venue_id, show.artist_id, as_utc(show.start_time))
+
+    # earliest first, so of two clashing shows in the batch the first wins
+    scheduled = []
+    for start, (reference, row) in sorted(zip(starts, candidates), key=lambda pair: pair[0]):
+        error = bookings.conflict(row['venue_id'], row['artist_id'], start)
+        if error:
+            rejected.append((reference, error))
+        else:
+            bookings.add(row['venue_id'], row['artist_id'], start)
+            scheduled.append(dict(row, start_time=start))
+
+    if strict and rejected:
+        return [], rejected
+
+    if scheduled:
+        db.session.execute(Show.__table__.insert(), scheduled)
+        # bulk inserts skip the Show listeners maintaining the counters
+        queries.refresh_upcoming_counts(
+            venue_ids=sorted({row['venue_id'] for row in scheduled}),
+            artist_ids=sorted({row['artist_id'] for row in scheduled}))
+
+    return scheduled, rejected
@@ -0,0 +1,66 @@
+#----------------------------------------------------------------------------#
+# Imports
+#----------------------------------------------------------------------------#
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+
+#----------------------------------------------------------------------------#
+# Template precompilation.
+#
+# Jinja compiles a template to Python the first time a worker renders it,
+# so right after a deploy or a scale-up every page pays for it once. With
+# TEMPLATE_BYTECODE_CACHE_DIR the compiled code is stored on disk, by
+# `flask templates compile` at build time or by whichever worker compiles
+# a template first, and loaded from there instead. TEMPLATE_WARMUP loads
+# every template when the app starts, before the first request.
+#----------------------------------------------------------------------------#
+
+
+def template_names(app):
+    # the html templates, not the stylesheet kept next to them
+    return app.jinja_env.list_templates(extensions=['html'])
+
+
+def init_templates(app):
+    """Set up the bytecode cache and warm the templates up.
+
+    Call it once the filters and extensions are registered, templates
+    compiled before that would fail or miss them.
+    """
+    directory = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    if app.config.get('TEMPLATE_WARMUP', True):
+        count, elapsed = warm_templates(app)
+        app.logger.debug('loaded %d templates in %.1fms', count, elapsed * 1000)
+
+
+def warm_templates(app):
+    """Load every template into the environment's cache.
+
+    Returns the number of templates and the seconds it took.
+    """
+    started = time.perf_counter()
+    names = template_names(app)
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), time.perf_counter() - started
+
+
+def compile_templates(app):
+    """Compile every template into the bytecode cache, replacing its content.
+
+    Stale entries would be replaced on their own as the cache checks each
+    template's source, clearing drops the ones of removed templates.
+    """
+    cache = app.jinja_env.bytecode_cache
+    if cache is None:
+        raise RuntimeError('TEMPLATE_BYTECODE_CACHE_DIR is not set')
+    cache.clear()
+    # the environment would hand back the templates it already holds
+    app.jinja_env.cache.clear()
+    return warm_templates(app)
@@ -0,0 +1,191 @@
+#----------------------------------------------------------------------------#
+# Response cache tests.
+#
+# Both backends run against a controllable clock; RedisBackend talks to a
+# dict-based fake providing the get/set/mget/incr it uses.
+#----------------------------------------------------------------------------#
+from types import SimpleNamespace
+
+import pytest
+from flask import Flask
+
+import cache
+from cache import LRUBackend, RedisBackend, ResponseCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeRedis:
+    """Dict-based stand-in for redis.Redis: bytes values, `ex` expiry."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}
+
+    def get(self, key):
+        expires, value = self.data.get(key, (None, None))
+        if expires is not None and expires <= self.clock():
+            del self.data[key]
+            return None
+        return value
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (self.clock() + ex if ex else None, value)
+
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+
+    def incr(self, key):
+        value = int(self.get(key) or 0) + 1
+        self.data[key] = (None, str(value).encode())
+        return value
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, 'time', SimpleNamespace(monotonic=clock))
+    return clock
+
+
+@pytest.fixture(params=['lru', 'redis'])
+def backend(request, clock):
+    if request.param == 'lru':
+        return LRUBackend(max_entries=8)
+    return RedisBackend(FakeRedis(clock))
+
+
+def test_get_returns_what_was_set(backend):
+    assert backend.get('view:/venues') is None
+    backend.set('view:/venues', '<h1>Venues</h1>', 60)
+    assert backend.get('view:/venues') == '<h1>Venues</h1>'
+
+
+def test_entries_expire_after_their_timeout(backend, clock):
+    backend.set('view:/venues', 'page', 60)
+
+    clock.now += 59
+    assert backend.get('view:/venues') == 'page'
+    clock.now += 2
+    assert backend.get('view:/venues') is None
+
+
+def test_versions_start_at_zero_and_bump_per_tag(backend):
+    assert backend.versions([]) == []
+    assert backend.versions(['venues', 'venue:1']) == [0, 0]
+
+    backend.bump(['venue:1'])
+    backend.bump(['venue:1', 'shows'])
+
+    assert backend.versions(['venues', 'venue:1', 'shows']) == [0, 2, 1]
+
+
+def test_versions_do_not_expire(backend, clock):
+    backend.bump(['venues'])
+    clock.now += 10 ** 6
+    assert backend.versions(['venues']) == [1]
+
+
+def test_lru_evicts_the_least_recently_used_entry():
+    backend = LRUBackend(max_entries=2)
+    backend.set('a', '1', 60)
+    backend.set('b', '2', 60)
+    backend.get('a')
+    backend.set('c', '3', 60)
+
+    assert [backend.get(key) for key in 'abc'] == ['1', None, '3']
+
+
+def test_lru_eviction_keeps_the_versions():
+    backend = LRUBackend(max_entries=1)
+    backend.bump(['venues'])
+    backend.set('a', '1', 60)
+    backend.set('b', '2', 60)
+
+    assert backend.versions(['venues']) == [1]
+
+
+def test_redis_keys_are_prefixed(clock):
+    client = FakeRedis(clock)
+    backend = RedisBackend(client, prefix='test:')
+    backend.set('view:/', 'page', 60)
+    backend.bump(['venues'])
+
+    assert sorted(client.data) == ['test:tag:venues', 'test:view:/']
+
+
+#----------------------------------------------------------------------------#
+# Cached views and invalidation.
+#----------------------------------------------------------------------------#
+
+
+@pytest.fixture
+def site(backend):
+    app = Flask(__name__)
+    app.config.update(SECRET_KEY='test', CACHE_DEFAULT_TIMEOUT=60)
+    response_cache = ResponseCache()
+    response_cache.init_app(app, backend=backend)
+    renders = []
+
+    @app.route('/venues/<int:venue_id>')
+    @response_cache.cached('venues', 'venue:{venue_id}')
+    def venue(venue_id):
+        renders.append(venue_id)
+        return 'venue %d, render %d' % (venue_id, len(renders))
+
+    return SimpleNamespace(client=app.test_client(), cache=response_cache, renders=renders)
+
+
+def test_cached_pages_render_once(site):
+    first = site.client.get('/venues/1').get_data(as_text=True)
+    again = site.client.get('/venues/1').get_data(as_text=True)
+
+    assert first == again == 'venue 1, render 1'
+    assert site.client.get('/venues/1?page=2').get_data(as_text=True) == 'venue 1, render 2'
+
+
+def test_invalidating_a_tag_renders_its_pages_again(site):
+    site.client.get('/venues/1')
+    site.client.get('/venues/2')
+
+    site.cache.invalidate('venue:1')
+    site.client.get('/venues/1')
+    site.client.get('/venues/2')
+    assert site.renders == [1, 2, 1]
+
+    site.cache.invalidate('venues')
+    site.client.get('/venues/1')
+    site.client.get('/venues/2')
+    assert site.renders == [1, 2, 1, 1, 2]
+
+
+def test_cached_pages_expire(site, clock):
+    site.client.get('/venues/1')
+    clock.now += 61
+    site.client.get('/venues/1')
+
+    assert site.renders == [1, 1]
+
+
+def test_memoized_values_follow_their_tags(site):
+    calls = []
+
+    def counts(genres, match):
+        calls.append((genres, match))
+        return [{"genre": genre, "count": 1} for genre in genres]
+
+    with Flask(__name__).test_request_context():
+        first = site.cache.memoize('genres', ['venues'], counts, genres=['Jazz'], match='all')
+        again = site.cache.memoize('genres', ['venues'], counts, genres=['Jazz'], match='all')
+        site.cache.memoize('genres', ['venues'], counts, genres=['Jazz'], match='any')
+        site.cache.invalidate('venues')
+        site.cache.memoize('genres', ['venues'], counts, genres=['Jazz'], match='all')
+
+    assert first == again == [{"genre": "Jazz", "count": 1}]
+    assert calls == [(['Jazz'], 'all'), (['Jazz'], 'any'), (['Jazz'], 'all')]
@@ -0,0 +1,124 @@
+#----------------------------------------------------------------------------#
+# Import validation tests.
+#
+# Rows as read from CSV (every value a string) or JSONL, through the
+# clean_* functions; none of them touches the database.
+#----------------------------------------------------------------------------#
+import io
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from wtforms.validators import ValidationError
+
+from importer import clean_artist, clean_show, clean_venue, read_rows
+
+VENUE = {"name": "The Musical Hop", "city": "San Francisco", "state": "CA",
+         "address": "1015 Folsom Street", "phone": "123-123-1234",
+         "genres": ["Jazz", "Reggae"]}
+ARTIST = {"name": "Guns N Petals", "city": "San Francisco", "state": "CA",
+          "phone": "326-123-5000", "genres": ["Rock n Roll"]}
+SHOW = {"venue_id": 1, "artist_id": 4, "start_time": "2026-11-01T20:00:00"}
+
+CLEAN = {'venue': clean_venue, 'artist': clean_artist, 'show': clean_show}
+ROWS = {'venue': VENUE, 'artist': ARTIST, 'show': SHOW}
+
+
+def row(kind, **changes):
+    # the valid row of `kind` with some fields replaced, None drops them
+    data = dict(ROWS[kind], **changes)
+    return {name: value for name, value in data.items() if value is not None}
+
+
+@pytest.mark.parametrize('kind, data, error', [
+    ('venue', row('venue', name=None), 'name is required'),
+    ('venue', row('venue', name='   '), 'name is required'),
+    ('venue', row('venue', name='x' * 121), 'name is longer than 120 characters'),
+    ('venue', row('venue', city=None), 'city is required'),
+    ('venue', row('venue', address=None), 'address is required'),
+    ('venue', row('venue', state='XX'), 'invalid state XX'),
+    ('venue', row('venue', state=None), 'state is required'),
+    ('venue', row('venue', phone='1231231234'), 'phone number must be in format xxx-xxx-xxxx'),
+    ('venue', row('venue', genres=[]), 'genres is required'),
+    ('venue', row('venue', genres='Jazz, Polka'), 'unknown genres: Polka'),
+    ('venue', row('venue', image_link='not a url'), 'Invalid URL'),
+    ('venue', row('venue', seeking_description='x' * 121),
+     'seeking_description is longer than 120 characters'),
+    ('artist', row('artist', name=None), 'name is required'),
+    ('artist', row('artist', state='ca'), 'invalid state ca'),
+    ('artist', row('artist', genres=None), 'genres is required'),
+    ('artist', row('artist', website_link='ftp//nowhere'), 'Invalid URL'),
+    ('artist', row('artist', seeking_description='x' * 501),
+     'seeking_description is longer than 500 characters'),
+    ('show', row('show', venue_id=None), 'venue_id and artist_id must be integers'),
+    ('show', row('show', artist_id='four'), 'venue_id and artist_id must be integers'),
+    ('show', row('show', start_time=None), 'start_time is required'),
+    ('show', row('show', start_time='next friday'), 'start_time must be an ISO 8601 datetime'),
+    ('venue', ['The Musical Hop'], 'expected an object, got list'),
+    ('artist', 'Guns N Petals', 'expected an object, got str'),
+    ('show', None, 'expected an object, got NoneType'),
+])
+def test_rejected_rows(kind, data, error):
+    with pytest.raises(ValidationError) as raised:
+        CLEAN[kind](data)
+    assert error in str(raised.value)
+
+
+@pytest.mark.parametrize('kind, data, expected', [
+    # CSV: strings are trimmed, genres split, booleans parsed, blanks None
+    ('venue', {"name": " The Musical Hop ", "city": "San Francisco", "state": "CA",
+               "address": "1015 Folsom Street", "phone": "123-123-1234",
+               "genres": "Jazz, Reggae,", "image_link": "", "facebook_link": "",
+               "website_link": "https://www.themusicalhop.com",
+               "seeking_talent": "Yes", "seeking_description": ""},
+     {"name": "The Musical Hop", "city": "San Francisco", "state": "CA",
+      "address": "1015 Folsom Street", "phone": "123-123-1234",
+      "genres": ["Jazz", "Reggae"], "image_link": None, "facebook_link": None,
+      "website_link": "https://www.themusicalhop.com",
+      "seeking_talent": True, "seeking_description": None}),
+    ('artist', dict(ARTIST, seeking_venue="false", genres="Rock n Roll"),
+     {"name": "Guns N Petals", "city": "San Francisco", "state": "CA",
+      "phone": "326-123-5000", "genres": ["Rock n Roll"], "image_link": None,
+      "facebook_link": None, "website_link": None, "seeking_venue": False,
+      "seeking_description": None}),
+    # JSONL: native types pass through
+    ('artist', dict(ARTIST, seeking_venue=True, seeking_description="Looking for gigs"),
+     {"name": "Guns N Petals", "city": "San Francisco", "state": "CA",
+      "phone": "326-123-5000", "genres": ["Rock n Roll"], "image_link": None,
+      "facebook_link": None, "website_link": None, "seeking_venue": True,
+      "seeking_description": "Looking for gigs"}),
+    # naive times are UTC, others are converted to it
+    ('show', {"venue_id": "1", "artist_id": " 4", "start_time": "2026-11-01 20:00"},
+     {"venue_id": 1, "artist_id": 4,
+      "start_time": datetime(2026, 11, 1, 20, 0, tzinfo=timezone.utc)}),
+    ('show', dict(SHOW, start_time="2026-11-01T22:00:00+02:00"),
+     {"venue_id": 1, "artist_id": 4,
+      "start_time": datetime(2026, 11, 1, 20, 0, tzinfo=timezone.utc)}),
+])
+def test_normalized_rows(kind, data, expected):
+    cleaned = CLEAN[kind](data)
+    assert cleaned == expected
+    if kind == 'show':
+        assert cleaned["start_time"].utcoffset() == timedelta(0)
+
+
+def test_unreadable_jsonl_lines_are_rejected_with_their_line_number():
+    stream = io.StringIO('{"venue_id": 1, "artist_id": 4, "start_time": "2026-11-01"}\n'
+                         '\n'
+                         '{"venue_id": 1,\n'
+                         '[1, 4]\n')
+    results = []
+    for line_num, data in read_rows(stream, 'jsonl'):
+        try:
+            clean_show(data)
+            results.append((line_num, None))
+        except ValidationError as error:
+            results.append((line_num, str(error)))
+
+    assert results == [(1, None),
+                       (3, 'invalid JSON at column 16: Expecting property name enclosed in double quotes'),
+                       (4, 'expected an object, got list')]
+
+
+def test_csv_rows_carry_their_line_number():
+    stream = io.StringIO('venue_id,artist_id,start_time\n1,4,2026-11-01\n2,5,2026-11-02\n')
+    assert [line_num for line_num, _ in read_rows(stream, 'csv')] == [2, 3]
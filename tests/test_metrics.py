@@ -0,0 +1,113 @@
+#----------------------------------------------------------------------------#
+# Metric type tests.
+#----------------------------------------------------------------------------#
+import gc
+import threading
+
+import pytest
+
+from metrics import Counter, Family, Histogram
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # the thread-locals, and with them the shards' tokens, go with the threads
+    gc.collect()
+
+
+def test_counter_keeps_the_counts_of_finished_threads():
+    counter = Counter('test_total', 'Test counter.')
+    counter.inc(5)
+
+    def work():
+        for _ in range(100):
+            counter.inc()
+
+    run_threads(50, work)
+
+    assert counter.value == 5 + 50 * 100
+    # only the live thread keeps a shard, the others were folded in
+    assert len(counter._shards) == 1
+
+
+def test_shards_do_not_pile_up_across_thread_generations():
+    counter = Counter('test_total', 'Test counter.')
+    for _ in range(10):
+        run_threads(20, counter.inc)
+
+    assert counter.value == 200
+    assert counter._shards == {}
+
+
+def test_histogram_keeps_the_observations_of_finished_threads():
+    histogram = Histogram('test_seconds', 'Test histogram.', buckets=(1, 2))
+
+    def work():
+        histogram.observe(0.5)
+        histogram.observe(3)
+
+    run_threads(10, work)
+
+    assert histogram._totals() == [10, 0, 10, 35.0]
+
+
+def test_histogram_buckets_are_cumulative_and_inclusive():
+    histogram = Histogram('test_seconds', 'Test histogram.', buckets=(0.1, 1, 10))
+    for value in (0.05, 0.1, 0.5, 1, 1.5, 20):
+        histogram.observe(value)
+
+    assert histogram.samples() == [
+        # le is inclusive: 0.1 and 1 land in their own bucket
+        'test_seconds_bucket{le="0.1"} 2',
+        'test_seconds_bucket{le="1"} 4',
+        'test_seconds_bucket{le="10"} 5',
+        'test_seconds_bucket{le="+Inf"} 6',
+        'test_seconds_sum %s' % (0.05 + 0.1 + 0.5 + 1 + 1.5 + 20),
+        'test_seconds_count 6',
+    ]
+
+
+def test_empty_histogram_renders_zero_buckets():
+    histogram = Histogram('test_seconds', 'Test histogram.', buckets=(1,))
+
+    assert histogram.render() == [
+        '# HELP test_seconds Test histogram.',
+        '# TYPE test_seconds histogram',
+        'test_seconds_bucket{le="1"} 0',
+        'test_seconds_bucket{le="+Inf"} 0',
+        'test_seconds_sum 0',
+        'test_seconds_count 0',
+    ]
+
+
+@pytest.mark.parametrize('labels, rendered', [
+    ((), 'test_total 3'),
+    ((('endpoint', 'venues'),), 'test_total{endpoint="venues"} 3'),
+    ((('endpoint', 'say "hi"'),), 'test_total{endpoint="say \\"hi\\""} 3'),
+])
+def test_counter_samples_with_labels(labels, rendered):
+    counter = Counter('test_total', 'Test counter.')
+    counter.inc(3)
+
+    assert counter.samples(labels) == [rendered]
+
+
+def test_family_sums_label_values_separately_across_threads():
+    family = Family(Counter, 'test_requests_total', 'Test family.', ('endpoint',))
+
+    def work():
+        family.labels('venues').inc()
+        family.labels('artists').inc(2)
+
+    run_threads(25, work)
+
+    assert family.render() == [
+        '# HELP test_requests_total Test family.',
+        '# TYPE test_requests_total counter',
+        'test_requests_total{endpoint="artists"} 50',
+        'test_requests_total{endpoint="venues"} 25',
+    ]
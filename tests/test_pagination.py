@@ -0,0 +1,152 @@
+#----------------------------------------------------------------------------#
+# Keyset pagination tests.
+#
+# Cursors are checked on their own; pages are read from a small table in
+# an in-memory SQLite database, which the keyset comparisons need nothing
+# PostgreSQL specific for.
+#----------------------------------------------------------------------------#
+import base64
+from datetime import datetime
+
+import pytest
+
+from queries import _decode_cursor, _encode_cursor, _keyset_page
+
+
+def b64(text):
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+TYPES = [str, int]
+
+
+@pytest.mark.parametrize('cursor', [
+    None,
+    '',
+    'not base64!',
+    b64('not json'),
+    b64('{"name": "a", "id": 1}'),
+    b64('"a"'),
+    b64('[]'),
+    b64('["a"]'),
+    b64('["a", 1, 2]'),
+    b64('["a", null]'),
+    b64('["a", "one"]'),
+    b64('["a", {"id": 1}]'),
+    b64('["a", [1]]'),
+], ids=['none', 'empty', 'bad base64', 'not json', 'object', 'scalar',
+        'no values', 'too few', 'too many', 'null', 'not a number',
+        'nested object', 'nested list'])
+def test_malformed_cursors_start_over(cursor):
+    assert _decode_cursor(cursor, TYPES) is None
+
+
+def test_malformed_datetime_cursors_start_over():
+    assert _decode_cursor(b64('["tomorrow", 1]'), [datetime, int]) is None
+
+
+def test_cursors_round_trip():
+    start = datetime(2026, 11, 1, 20, 0)
+    assert _decode_cursor(_encode_cursor(['Blue Note', 7]), TYPES) == ('Blue Note', 7)
+    assert _decode_cursor(_encode_cursor([start, 7]), [datetime, int]) == (start, 7)
+
+
+#----------------------------------------------------------------------------#
+# Pages.
+#----------------------------------------------------------------------------#
+
+# two rows share a name, the id breaks the tie
+NAMES = ['Alpha', 'Bravo', 'Bravo', 'Charlie', 'Delta', 'Echo', 'Foxtrot']
+
+
+@pytest.fixture
+def items():
+    import app as fyyur
+    from models import db
+
+    app = fyyur.app
+    config = dict(app.config)
+    app.config.update(SQLALCHEMY_DATABASE_URI='sqlite://', PAGE_SIZE=3, MAX_PAGE_SIZE=5)
+    table = db.Table('keyset_item', db.MetaData(),
+                     db.Column('id', db.Integer, primary_key=True),
+                     db.Column('name', db.String, nullable=False))
+    with app.app_context():
+        table.create(db.engine)
+        db.session.execute(table.insert(), [{"id": index + 1, "name": name}
+                                            for index, name in enumerate(NAMES)])
+        yield table
+        db.session.remove()
+        table.drop(db.engine)
+    app.config.clear()
+    app.config.update(config)
+
+
+def page(table, **kwargs):
+    from models import db
+
+    query = db.session.query(table.c.name, table.c.id)
+    result = _keyset_page(query, [table.c.name, table.c.id], **kwargs)
+    result["items"] = [tuple(row) for row in result["items"]]
+    return result
+
+
+def walk(table, direction, cursor, limit):
+    # every page from `cursor` on in `direction` ('next' or 'prev')
+    pages = []
+    while cursor:
+        pages.append(page(table, limit=limit,
+                          **{'after' if direction == 'next' else 'before': cursor}))
+        cursor = pages[-1][direction]
+    return pages
+
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 5])
+def test_pages_walk_every_row_once_both_ways(items, limit):
+    rows = [(name, index + 1) for index, name in enumerate(NAMES)]
+
+    first = page(items, limit=limit)
+    assert first["prev"] is None
+    forward = [first] + walk(items, 'next', first["next"], limit)
+    assert [row for result in forward for row in result["items"]] == rows
+    assert all(len(result["items"]) == limit for result in forward[:-1])
+    assert forward[-1]["next"] is None
+
+    # back from the last page to the first, which has no prev again
+    backward = walk(items, 'prev', forward[-1]["prev"], limit)
+    assert [result["items"] for result in reversed(backward)] == \
+        [result["items"] for result in forward[:-1]]
+    if backward:
+        assert backward[-1]["prev"] is None
+
+
+def test_a_short_last_page_has_no_next(items):
+    first = page(items, limit=4)
+    second = page(items, limit=4, after=first["next"])
+
+    assert len(second["items"]) == 3
+    assert second["next"] is None
+    assert second["prev"] is not None
+
+
+def test_pages_past_either_end_are_empty(items):
+    after_last = page(items, after=_encode_cursor(['Foxtrot', 7]))
+    before_first = page(items, before=_encode_cursor(['Alpha', 1]))
+
+    assert after_last == {"items": [], "limit": 3, "prev": None, "next": None}
+    assert before_first["items"] == [] and before_first["next"] is None
+
+
+def test_ties_are_split_by_id(items):
+    result = page(items, after=_encode_cursor(['Bravo', 2]))
+
+    assert result["items"][0] == ('Bravo', 3)
+
+
+def test_malformed_cursor_gives_the_first_page(items):
+    assert page(items, after=b64('["Bravo"]')) == page(items)
+    assert page(items, before='%%%') == page(items)
+
+
+@pytest.mark.parametrize('limit, size', [(None, 3), (0, 3), (-1, 3), (2, 2), (50, 5)])
+def test_page_size_defaults_and_caps(items, limit, size):
+    assert page(items, limit=limit)["limit"] == size
@@ -0,0 +1,138 @@
+#----------------------------------------------------------------------------#
+# Show scheduling tests.
+#
+# The booking checks are plain Python; schedule_shows runs against an
+# in-memory session and reference lookups, so no database is needed.
+#----------------------------------------------------------------------------#
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from models import as_utc
+import scheduler
+from scheduler import _Bookings
+
+HOURS = timedelta(hours=3)
+EIGHT_PM = datetime(2026, 11, 1, 20, 0, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def bookings():
+    # venue 1 and artist 10 have a show at 20:00
+    bookings = _Bookings(HOURS)
+    bookings.add(1, 10, EIGHT_PM)
+    return bookings
+
+
+@pytest.mark.parametrize('venue_id, artist_id, start, clash', [
+    (1, 11, EIGHT_PM, 'venue 1'),
+    (1, 11, EIGHT_PM + timedelta(hours=2, minutes=59), 'venue 1'),
+    (1, 11, EIGHT_PM - timedelta(hours=2, minutes=59), 'venue 1'),
+    (2, 10, EIGHT_PM + timedelta(hours=1), 'artist 10'),
+    (2, 10, EIGHT_PM - timedelta(hours=1), 'artist 10'),
+])
+def test_overlapping_shows_conflict(bookings, venue_id, artist_id, start, clash):
+    assert bookings.conflict(venue_id, artist_id, start).startswith(clash)
+
+
+@pytest.mark.parametrize('start', [EIGHT_PM + HOURS, EIGHT_PM - HOURS])
+def test_back_to_back_shows_do_not_conflict(bookings, start):
+    # a show may start right as the previous one ends, or end as the next starts
+    assert bookings.conflict(1, 10, start) is None
+
+
+def test_other_venues_and_artists_do_not_conflict(bookings):
+    assert bookings.conflict(2, 11, EIGHT_PM) is None
+
+
+def test_a_show_fits_between_two_bookings(bookings):
+    # venue 1 also has a show at 14:00, its afternoon is free from 17:00
+    bookings.add(1, 12, EIGHT_PM - 2 * HOURS)
+
+    assert bookings.conflict(1, 14, EIGHT_PM - HOURS) is None
+    assert bookings.conflict(1, 14, EIGHT_PM - HOURS + timedelta(minutes=30)) is not None
+    assert bookings.conflict(1, 14, EIGHT_PM - HOURS - timedelta(minutes=30)) is not None
+
+
+def test_naive_times_are_utc():
+    naive = datetime(2026, 11, 1, 20, 0)
+    assert as_utc(naive) == EIGHT_PM
+    assert as_utc(datetime(2026, 11, 1, 21, 0, tzinfo=timezone(timedelta(hours=1)))) == EIGHT_PM
+
+
+#----------------------------------------------------------------------------#
+# schedule_shows.
+#----------------------------------------------------------------------------#
+
+
+class FakeSession:
+    def __init__(self):
+        self.inserted = []
+
+    def connection(self):
+        return SimpleNamespace(dialect=SimpleNamespace(name='sqlite'))
+
+    def execute(self, statement, rows):
+        self.inserted.extend(rows)
+
+
+@pytest.fixture
+def session(monkeypatch):
+    # venue 1 and artist 10 exist and have a show at 20:00
+    session = FakeSession()
+    booked = [SimpleNamespace(id=1, venue_id=1, artist_id=10, start_time=EIGHT_PM)]
+    monkeypatch.setattr(scheduler, 'db', SimpleNamespace(session=session))
+    monkeypatch.setattr(scheduler, 'queries', SimpleNamespace(
+        missing_references=lambda venue_ids, artist_ids: (set(venue_ids) - {1, 2},
+                                                         set(artist_ids) - {10, 11}),
+        booked_shows=lambda venue_ids, artist_ids, start, end: booked,
+        refresh_upcoming_counts=lambda venue_ids, artist_ids: None))
+    return session
+
+
+def show(venue_id, artist_id, start):
+    return {"venue_id": venue_id, "artist_id": artist_id, "start_time": start}
+
+
+def test_schedule_rejects_conflicts_and_missing_references(session):
+    rows = [(1, show(2, 11, EIGHT_PM)),
+            (2, show(1, 11, EIGHT_PM + timedelta(hours=1))),
+            (3, show(3, 11, EIGHT_PM)),
+            # clashes with line 1, the earlier show of the batch wins
+            (4, show(2, 11, EIGHT_PM + timedelta(hours=2)))]
+
+    scheduled, rejected = scheduler.schedule_shows(rows, HOURS)
+
+    assert scheduled == [show(2, 11, EIGHT_PM)]
+    assert session.inserted == scheduled
+    assert [line for line, _ in sorted(rejected)] == [2, 3, 4]
+
+
+def test_schedule_takes_naive_times_as_utc(session):
+    scheduled, rejected = scheduler.schedule_shows(
+        [(1, show(1, 11, datetime(2026, 11, 1, 23, 0)))], HOURS)
+
+    assert rejected == []
+    assert scheduled[0]["start_time"] == EIGHT_PM + HOURS
+
+
+def test_strict_schedule_rejects_the_whole_batch(session):
+    rows = [(1, show(2, 11, EIGHT_PM)),
+            (2, show(1, 11, EIGHT_PM))]
+
+    scheduled, rejected = scheduler.schedule_shows(rows, HOURS, strict=True)
+
+    assert scheduled == []
+    assert session.inserted == []
+    assert [line for line, _ in rejected] == [2]
+
+
+def test_strict_schedule_inserts_a_clean_batch(session):
+    rows = [(1, show(2, 11, EIGHT_PM)),
+            (2, show(1, 11, EIGHT_PM + HOURS))]
+
+    scheduled, rejected = scheduler.schedule_shows(rows, HOURS, strict=True)
+
+    assert rejected == []
+    assert len(session.inserted) == 2